@@ -1,11 +1,45 @@
-from langchain.agents import create_tool_calling_agent
+import asyncio
+import contextvars
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from langchain_core.agents import AgentAction, AgentFinish
 from agent.prompts import system_prompt, user_prompt
 from agent.tools import get_tools
+from agent.answer_cache import get_answer_cache
+from agent.answer_stream import stream_answers_to
+from agent.llm_usage import ExecutionBudget, track_llm_usage
+from agent.router import get_router
+from utils import tracing
 
-from langchain.prompts import ChatPromptTemplate
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT_SECONDS", "60"))
+# Return answers that tools mark as final without another model turn to restate them.
+DIRECT_RETURN = os.getenv("AGENT_DIRECT_RETURN", "true").lower() in ("1", "true", "yes")
+
+# Shared across requests and kept out of asyncio's default executor, so a tool that
+# overruns its timeout never holds up the event loop's shutdown.
+_TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("TOOL_MAX_WORKERS", "16")), thread_name_prefix="agent-tool")
+
+TOOL_DISPLAY_NAMES = {
+    "RAG": "Internal HR Policy Search",
+    "WebSearch": "Web Search",
+    "InsuranceQuery": "Insurance Policy Search",
+    "InsuranceDocument": "Insurance Document Retrieval",
+    "rag_tool": "Internal HR Policy Search",
+    "websearch_tool": "Web Search",
+    "insurance_query_tool": "Insurance Policy Search",
+    "insurance_document_tool": "Insurance Document Retrieval",
+}
 
 def get_agent(llm):
+    # langchain.agents pulls in most of langchain; only pay for it when an agent is built.
+    from langchain.agents import create_tool_calling_agent
+    from langchain.prompts import ChatPromptTemplate
+
     tools = get_tools()
     prompt = ChatPromptTemplate.from_messages([
         ("system", system_prompt),
@@ -20,94 +54,486 @@ def get_agent(llm):
     return agent, tools
 
 
-def run_agent_with_tools(agent, user_input, tools):
-    intermediate_steps = []
-    input_dict = {"input": user_input, "intermediate_steps": intermediate_steps}
-    response = agent.invoke(input_dict)
-    while (isinstance(response, list) and response and isinstance(response[0], AgentAction)) or isinstance(response, AgentAction):
-        if isinstance(response, list):
-            action = response[0]
-        else:
-            action = response
-        tool_name = action.tool
-        tool_input = action.tool_input
-        tool = next((t for t in tools if t.name.lower() == tool_name.lower()), None)
-        if tool is None:
-            tool = next((t for t in tools if tool_name.lower() in t.name.lower()), None)
-        if tool is None:
-            tool_result = f"Tool {tool_name} not found."
-        else:
-            try:
-                if hasattr(tool, "run"):
-                    tool_result = tool.run(tool_input)
-                elif hasattr(tool, "invoke"):
-                    tool_result = tool.invoke(tool_input)
-                else:
-                    tool_result = tool(tool_input)
-            except Exception as e:
-                tool_result = f"Tool {tool_name} error: {e}"
-        if isinstance(tool_result, dict):
-            answer = tool_result.get("answer", str(tool_result))
-            tool_used = tool_result.get("tool", "Unknown")
-            citations = tool_result.get("citations", [])
-            tool_result = {
-                "answer": answer,
-                "tool": tool_used,
-                "citations": citations
-            }
-        else:
-            answer = str(tool_result)
-            tool_used = action.tool if hasattr(action, 'tool') else "Unknown"
-            citations = []
-            tool_result = {
-                "answer": answer,
-                "tool": tool_used,
-                "citations": citations
-            }
-        intermediate_steps.append((action, tool_result))
-        response = agent.invoke({"input": user_input, "intermediate_steps": intermediate_steps})
-    final_answer = None
-    tool_used = None
-    citations = []
+_SHARED_AGENT = None
+_agent_lock = threading.Lock()
+_stats = {"questions": 0, "llm_calls": 0, "direct_returns": 0, "budget_stops": 0, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0}
+_stats_lock = threading.Lock()
+
+
+def get_shared_agent():
+    """Process-wide (agent, tools) on the shared Bedrock client.
+
+    The agent is a stateless runnable (per-request state lives in the runner's
+    intermediate steps), so every Streamlit session can use the same instance.
+    """
+    global _SHARED_AGENT
+    if _SHARED_AGENT is None:
+        with _agent_lock:
+            if _SHARED_AGENT is None:
+                from providers.bedrock import get_llm
+
+                _SHARED_AGENT = get_agent(get_llm())
+    return _SHARED_AGENT
+
+
+def _next_actions(response):
+    """All tool calls the model asked for in this turn (a tool-calling model may request several)."""
+    if isinstance(response, list):
+        return [a for a in response if isinstance(a, AgentAction)]
+    if isinstance(response, AgentAction):
+        return [response]
+    return []
+
+
+def _route(user_input):
+    """Ask the local router for a tool; None (or a route without "tool") leaves the choice to the agent."""
+    try:
+        router = get_router()
+        with tracing.span("router") as span:
+            route = router.route(user_input) if router is not None else None
+            span.set(tool=route and route["tool"])
+    except Exception as e:
+        print(f"[Router] Routing failed: {e}")
+        return None
+    if route and route["tool"]:
+        print(f"[Router] {route['tool']} ({route['reason']}, similarity {route['score']})")
+    return route
+
+
+def _routed_action(tool_name, user_input, tools):
+    """A tool call shaped as if the model had made it, so the agent's next turn sees a normal tool exchange."""
+    from langchain.agents.output_parsers.tools import ToolAgentAction
+    from langchain_core.messages import AIMessage
+
+    tool = next(t for t in tools if t.name == tool_name)
+    args = {next(iter(tool.args)): user_input}
+    call_id = f"route_{uuid.uuid4().hex[:16]}"
+    return ToolAgentAction(
+        tool=tool_name,
+        tool_input=args,
+        log=f"\nInvoking: `{tool_name}` with `{args}` (routed)\n",
+        message_log=[AIMessage(content="", tool_calls=[{"name": tool_name, "args": args, "id": call_id, "type": "tool_call"}])],
+        tool_call_id=call_id,
+    )
+
+
+def _record_agent_choice(route, response, seconds):
+    if route is None:
+        return
+    actions = _next_actions(response)
+    try:
+        get_router().record_agent_choice(route, actions[0].tool if actions else None, seconds)
+    except Exception as e:
+        print(f"[Router] Could not record agent choice: {e}")
+
+
+def _run_tool(action, tools):
+    with tracing.span(f"tool.{action.tool}") as span:
+        result = _execute_tool(action, tools)
+        span.set(error=bool(result["error"]), final=bool(result.get("final")))
+    return result
+
+
+def _execute_tool(action, tools):
+    tool_name = action.tool
+    tool_input = action.tool_input
+    tool = next((t for t in tools if t.name.lower() == tool_name.lower()), None)
+    if tool is None:
+        tool = next((t for t in tools if tool_name.lower() in t.name.lower()), None)
+    failed = False
+    if tool is None:
+        tool_result = f"Tool {tool_name} not found."
+        failed = True
+    else:
+        try:
+            if hasattr(tool, "run"):
+                tool_result = tool.run(tool_input)
+            elif hasattr(tool, "invoke"):
+                tool_result = tool.invoke(tool_input)
+            else:
+                tool_result = tool(tool_input)
+        except Exception as e:
+            tool_result = f"Tool {tool_name} error: {e}"
+            failed = True
+    if isinstance(tool_result, dict):
+        return {
+            "answer": tool_result.get("answer", str(tool_result)),
+            "tool": tool_result.get("tool", "Unknown"),
+            "citations": tool_result.get("citations", []),
+            "error": tool_result.get("error", False),
+            "final": tool_result.get("final", False),
+        }
+    return {
+        "answer": str(tool_result),
+        "tool": action.tool if hasattr(action, 'tool') else "Unknown",
+        "citations": [],
+        "error": failed
+    }
+
+
+async def _arun_tool(action, tools, timeout):
+    try:
+        call = contextvars.copy_context().run
+        future = asyncio.get_running_loop().run_in_executor(_TOOL_EXECUTOR, call, _run_tool, action, tools)
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        # The worker thread cannot be killed; its late result is simply discarded.
+        return {"answer": f"Tool {action.tool} timed out after {timeout:.0f}s.", "tool": action.tool, "citations": [], "error": True}
+
+
+async def _arun_tools(actions, tools, timeout=TOOL_TIMEOUT):
+    """Run every tool call from one model turn concurrently; returns (action, result) steps in call order."""
+    results = await asyncio.gather(*(_arun_tool(action, tools, timeout) for action in actions))
+    return list(zip(actions, results))
+
+
+def _final_answer(response):
     if isinstance(response, list) and response:
         if isinstance(response[0], AgentFinish):
-            agent_finish = response[0]
-            output = agent_finish.return_values
+            output = response[0].return_values
             if isinstance(output, dict) and "output" in output:
-                final_answer = output["output"]
-            else:
-                final_answer = str(output)
-        else:
-            final_answer = str(response)
-    elif isinstance(response, AgentFinish):
+                return output["output"]
+            return str(output)
+        return str(response)
+    if isinstance(response, AgentFinish):
         output = response.return_values
         if isinstance(output, dict) and "output" in output:
-            final_answer = output["output"]
-        else:
-            final_answer = str(output)
-    elif isinstance(response, dict) and "output" in response:
-        final_answer = response["output"]
-    elif not isinstance(response, list) and not isinstance(response, dict) and hasattr(response, "return_values") and isinstance(response.return_values, dict) and "output" in response.return_values:
-        final_answer = response.return_values["output"]
+            return output["output"]
+        return str(output)
+    if isinstance(response, dict) and "output" in response:
+        return response["output"]
+    if not isinstance(response, list) and not isinstance(response, dict) and hasattr(response, "return_values") and isinstance(response.return_values, dict) and "output" in response.return_values:
+        return response.return_values["output"]
+    return str(response)
+
+
+def _is_final(steps):
+    """True when every tool result of the turn is a finished, successful answer the model need not restate."""
+    return DIRECT_RETURN and bool(steps) and all(
+        isinstance(result, dict) and result.get("final") and not result.get("error") for _, result in steps
+    )
+
+
+def _direct_answer(steps):
+    return "\n\n".join(dict.fromkeys(result["answer"] for _, result in steps))
+
+
+def _partial_result(steps, reason, streamed=""):
+    """Best answer available when the execution budget runs out: streamed text or the tool answers so far."""
+    print(f"[Agent] Stopping early: {reason} reached")
+    good_steps = [(action, result) for action, result in steps if isinstance(result, dict) and not result.get("error")]
+    note = f"_I had to stop before finishing this answer ({reason} reached)._"
+    if streamed.strip():
+        answer = f"{streamed.rstrip()}\n\n{note}"
+    elif good_steps:
+        answer = f"{note} Here is what I found so far:\n\n{_direct_answer(good_steps)}"
     else:
-        final_answer = str(response)
-    if intermediate_steps:
-        last_tool_result = intermediate_steps[-1][1]
-        if isinstance(last_tool_result, dict):
-            tool_used = last_tool_result.get("tool", None)
-            citations = last_tool_result.get("citations", [])
-
-    tool_display_names = {
-        "RAG": "Internal HR Policy Search",
-        "WebSearch": "Web Search",
-        "InsuranceQuery": "Insurance Policy Search",
-        "InsuranceDocument": "Insurance Document Retrieval"
-    }
+        answer = f"{note} Please try again or ask a narrower question."
+    result = _build_result(answer, good_steps)
+    # Never cached: the next attempt may well complete.
+    result["error"] = True
+    result["budget_exhausted"] = reason
+    return result
+
+
+def _record_question(result, budget, usage):
+    report = budget.report(usage)
+    result["usage"] = report
+    span = tracing.current_span()
+    if span is not None:
+        span.set(**report, direct=bool(result.get("direct")), budget_exhausted=result.get("budget_exhausted"))
+    with _stats_lock:
+        _stats["questions"] += 1
+        _stats["llm_calls"] += usage.calls
+        _stats["direct_returns"] += int(result.get("direct", False))
+        _stats["budget_stops"] += int("budget_exhausted" in result)
+        _stats["input_tokens"] += usage.input_tokens
+        _stats["output_tokens"] += usage.output_tokens
+        _stats["cost_usd"] += usage.cost
+    print(
+        f"[Agent] {usage.calls} LLM call(s), {usage.input_tokens}/{usage.output_tokens} tokens in/out, "
+        f"${report['cost_usd']:.4f}, {report['seconds']:.1f}s{' (direct return)' if result.get('direct') else ''}"
+    )
+
+
+def get_agent_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["llm_calls_per_question"] = round(stats["llm_calls"] / stats["questions"], 2) if stats["questions"] else None
+    stats["cost_usd"] = round(stats["cost_usd"], 4)
+    return stats
+
+
+def _build_result(final_answer, last_steps, direct=False):
+    """Collect the answer with the sources and references from the tool results of the last tool-calling turn."""
+    tools_used = []
+    sources = []
+    citations = []
+    failed = False
+    for _, tool_result in last_steps:
+        if isinstance(tool_result, dict):
+            tools_used.append(tool_result.get("tool", None))
+            # Which document a tool read, so the answer cache can check that document's revision.
+            sources.append((tool_result.get("tool", None), (tool_result.get("debug") or {}).get("document_id")))
+            citations.extend(tool_result.get("citations", []))
+            failed = failed or tool_result.get("error", False)
+    tools_used = [t for t in dict.fromkeys(tools_used) if t]
+    sources = [source for source in dict.fromkeys(sources) if source[0]]
+    citations = list(dict.fromkeys(citations))
 
     display = final_answer if isinstance(final_answer, str) else str(final_answer)
     if citations:
         display += "\n\n**References:**\n" + "\n".join(f"- {c}" for c in citations)
-    if tool_used:
-        friendly_name = tool_display_names.get(tool_used, tool_used)
+    if tools_used:
+        friendly_name = ", ".join(TOOL_DISPLAY_NAMES.get(t, t) for t in tools_used)
         display += f"\n\n_Source: {friendly_name}_"
-    return display
\ No newline at end of file
+    return {
+        "answer": final_answer, "tools": tools_used, "sources": sources, "citations": citations,
+        "error": failed, "direct": direct, "display": display,
+    }
+
+
+def _lookup_cached(user_input):
+    try:
+        with tracing.span("answer_cache.lookup") as span:
+            cached = get_answer_cache().lookup(user_input)
+            span.set(hit=cached is not None)
+        return cached
+    except Exception as e:
+        print(f"[Agent] Answer cache lookup failed: {e}")
+        return None
+
+
+def _remember(user_input, result):
+    if result["error"]:
+        return
+    try:
+        get_answer_cache().store(user_input, result)
+    except Exception as e:
+        print(f"[Agent] Answer cache store failed: {e}")
+
+
+async def _aturn(agent, user_input, intermediate_steps, budget):
+    """One model turn, abandoned (returns None) if it would overrun the deadline."""
+    try:
+        return await asyncio.wait_for(
+            agent.ainvoke({"input": user_input, "intermediate_steps": intermediate_steps}), budget.remaining()
+        )
+    except asyncio.TimeoutError:
+        return None
+
+
+async def _arun_agent(agent, user_input, tools, tool_timeout, budget, usage):
+    intermediate_steps = []
+    last_steps = []
+    response = None
+    route = _route(user_input)
+    if route and route["tool"]:
+        actions = [_routed_action(route["tool"], user_input, tools)]
+    else:
+        started = time.perf_counter()
+        response = await _aturn(agent, user_input, intermediate_steps, budget)
+        if response is None:
+            return _partial_result(intermediate_steps, f"time limit ({budget.deadline_seconds:.0f}s)")
+        _record_agent_choice(route, response, time.perf_counter() - started)
+        actions = _next_actions(response)
+    while actions:
+        if budget.out_of_steps():
+            return _partial_result(intermediate_steps, f"step limit ({budget.max_steps})")
+        budget.steps += 1
+        last_steps = await _arun_tools(actions, tools, min(tool_timeout, budget.remaining()))
+        if _is_final(last_steps):
+            return _build_result(_direct_answer(last_steps), last_steps, direct=True)
+        intermediate_steps.extend(last_steps)
+        reason = budget.exhausted(usage)
+        response = None if reason else await _aturn(agent, user_input, intermediate_steps, budget)
+        if response is None:
+            return _partial_result(intermediate_steps, reason or f"time limit ({budget.deadline_seconds:.0f}s)")
+        actions = _next_actions(response)
+    return _build_result(_final_answer(response), last_steps)
+
+
+async def arun_agent_with_tools(agent, user_input, tools, tool_timeout=TOOL_TIMEOUT):
+    """Agent loop that executes all tool calls of a model turn in parallel and feeds them back together.
+
+    Questions the local router can classify confidently go straight to their tool,
+    and a tool answer marked final is returned as-is instead of being restated by
+    the model. Near-duplicates of questions already answered from the HR index or
+    the insurance document are served from the semantic answer cache. Each question
+    runs under an ExecutionBudget and ends with a partial answer if it runs out.
+    """
+    budget = ExecutionBudget()
+    with tracing.span("agent.request", streaming=False), track_llm_usage() as usage:
+        cached = await asyncio.to_thread(_lookup_cached, user_input)
+        if cached is not None:
+            _record_question(dict(cached), budget, usage)
+            return cached["display"]
+        result = await _arun_agent(agent, user_input, tools, tool_timeout, budget, usage)
+        _record_question(result, budget, usage)
+    await asyncio.to_thread(_remember, user_input, result)
+    return result["display"]
+
+
+def run_agent_with_tools(agent, user_input, tools):
+    return asyncio.run(arun_agent_with_tools(agent, user_input, tools))
+
+
+def _chunk_text(chunk):
+    content = getattr(chunk, "content", "")
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content if isinstance(block, dict) and block.get("type") == "text")
+
+
+class _TurnCutOff(Exception):
+    """Raised when a streamed model turn is stopped at the deadline; carries the text streamed so far."""
+
+    def __init__(self, text):
+        super().__init__(text)
+        self.text = text
+
+
+def _pump_stream(model, input_dict, chunks, stop):
+    """Feed the model's stream into the queue; runs on its own thread so the caller can wait with a deadline."""
+    stream = model.stream(input_dict)
+    try:
+        for chunk in stream:
+            if stop.is_set():
+                return
+            chunks.put(("chunk", chunk))
+        chunks.put(("done", None))
+    except Exception as e:
+        chunks.put(("error", e))
+    finally:
+        stream.close()
+
+
+def _stream_turn(agent, input_dict, budget):
+    """Stream one model turn as token events and return the parsed agent output.
+
+    The model is streamed on a worker thread and every chunk is awaited with the
+    remaining budget as timeout, so a turn that overruns the deadline is cut off
+    (raising _TurnCutOff) even if the model stalls before its first chunk.
+    """
+    from langchain_core.runnables import RunnableSequence
+
+    model = RunnableSequence(*agent.steps[:-1])
+    parser = agent.steps[-1]
+    message = None
+    streamed = ""
+    chunks = queue.Queue()
+    stop = threading.Event()
+    # The worker thread cannot be killed; after a cut-off it stops at its next chunk and its output is discarded.
+    call = contextvars.copy_context().run
+    threading.Thread(target=call, args=(_pump_stream, model, input_dict, chunks, stop), name="agent-stream", daemon=True).start()
+    try:
+        while True:
+            try:
+                kind, item = chunks.get(timeout=budget.remaining())
+            except queue.Empty:
+                raise _TurnCutOff(streamed)
+            if kind == "done":
+                break
+            if kind == "error":
+                raise item
+            text = _chunk_text(item)
+            if text:
+                streamed += text
+                yield {"type": "token", "text": text}
+            message = item if message is None else message + item
+            if budget.remaining() <= 0:
+                raise _TurnCutOff(streamed)
+    finally:
+        stop.set()
+    return parser.invoke(message)
+
+
+def _stream_tools(actions, tools, timeout):
+    """Run one turn's tool calls like `_arun_tools`, yielding token events for the answer a lone tool streams meanwhile.
+
+    A single tool call may be the direct answer, so its model output is streamed
+    to the chat as it is generated; if it turns out not to be, a "discard" event
+    tells the caller to drop that text. Returns the (action, result) steps.
+    """
+    events = queue.Queue()
+    outcome = {}
+
+    def run():
+        streaming = stream_answers_to(lambda text: events.put(("token", text))) if DIRECT_RETURN and len(actions) == 1 else nullcontext()
+        try:
+            with streaming:
+                outcome["steps"] = asyncio.run(_arun_tools(actions, tools, timeout))
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            events.put(("done", None))
+
+    call = contextvars.copy_context().run
+    threading.Thread(target=call, args=(run,), name="agent-tools", daemon=True).start()
+    streamed = False
+    while True:
+        kind, text = events.get()
+        if kind == "done":
+            break
+        streamed = True
+        yield {"type": "token", "text": text}
+    if "error" in outcome:
+        raise outcome["error"]
+    if streamed and not _is_final(outcome["steps"]):
+        yield {"type": "discard"}
+    return outcome["steps"]
+
+
+def stream_agent_with_tools(agent, user_input, tools):
+    """Run the agent like `run_agent_with_tools`, yielding progress events as they happen.
+
+    Events are dicts with a "type" of:
+      - "tool_start": a tool is about to run ("tool", "input"); text streamed so far in the turn was not the answer
+      - "token": a piece of model output ("text")
+      - "discard": text streamed so far in the turn (by a tool) was not the answer
+      - "final": the complete formatted answer with references ("text") and the question's cost and latency ("usage")
+    """
+    budget = ExecutionBudget()
+    with tracing.span("agent.request", streaming=True), track_llm_usage() as usage:
+        cached = _lookup_cached(user_input)
+        if cached is not None:
+            result = dict(cached)
+        else:
+            result = yield from _stream_agent(agent, user_input, tools, budget, usage)
+        _record_question(result, budget, usage)
+    yield {"type": "final", "text": result["display"], "usage": result["usage"]}
+    if cached is None:
+        _remember(user_input, result)
+
+
+def _stream_agent(agent, user_input, tools, budget, usage):
+    intermediate_steps = []
+    last_steps = []
+    response = None
+    route = _route(user_input)
+    try:
+        if route and route["tool"]:
+            actions = [_routed_action(route["tool"], user_input, tools)]
+        else:
+            started = time.perf_counter()
+            response = yield from _stream_turn(agent, {"input": user_input, "intermediate_steps": intermediate_steps}, budget)
+            _record_agent_choice(route, response, time.perf_counter() - started)
+            actions = _next_actions(response)
+        while actions:
+            if budget.out_of_steps():
+                return _partial_result(intermediate_steps, f"step limit ({budget.max_steps})")
+            budget.steps += 1
+            for action in actions:
+                yield {"type": "tool_start", "tool": action.tool, "input": action.tool_input}
+            last_steps = yield from _stream_tools(actions, tools, min(TOOL_TIMEOUT, budget.remaining()))
+            if _is_final(last_steps):
+                return _build_result(_direct_answer(last_steps), last_steps, direct=True)
+            intermediate_steps.extend(last_steps)
+            reason = budget.exhausted(usage)
+            if reason:
+                return _partial_result(intermediate_steps, reason)
+            response = yield from _stream_turn(agent, {"input": user_input, "intermediate_steps": intermediate_steps}, budget)
+            actions = _next_actions(response)
+    except _TurnCutOff as cut:
+        return _partial_result(intermediate_steps, f"time limit ({budget.deadline_seconds:.0f}s)", streamed=cut.text)
+    return _build_result(_final_answer(response), last_steps)
@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+import numpy as np
+from providers.embeddings import get_embeddings
+from providers.vectorstore import get_index_version
+from agent.insurance_index import get_document_revision
+
+SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))
+TTL = float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+
+# Answers are only cached when they came from a source we can version; web results
+# go stale on their own schedule and already have their own cache. Sources that read
+# a specific document are passed its ID.
+SOURCE_VERSIONS = {
+    "RAG": get_index_version,
+    "InsuranceQuery": get_document_revision,
+}
+
+
+class SemanticAnswerCache:
+    """Answers keyed by question embedding, reused for near-duplicate questions.
+
+    Each entry remembers the version of every source it was built from (HR index
+    fingerprint, revision of each insurance document it read) and is dropped on
+    lookup once any of those versions has moved on.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, max_entries=MAX_ENTRIES, ttl=TTL):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._embeddings = None
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._entries = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _embed(self, question):
+        if self._embeddings is None:
+            self._embeddings = get_embeddings()
+        vector = np.asarray(self._embeddings.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, index):
+        del self._entries[index]
+        self._vectors = np.delete(self._vectors, index, axis=0)
+
+    @staticmethod
+    def _version(tool, document_id):
+        return SOURCE_VERSIONS[tool](document_id) if document_id else SOURCE_VERSIONS[tool]()
+
+    def _is_current(self, entry):
+        if time.time() - entry["created_at"] > self.ttl:
+            return False
+        return all(self._version(*source) == version for source, version in entry["versions"].items())
+
+    def lookup(self, question):
+        """Return the cached result for a near-duplicate question, or None."""
+        vector = self._embed(question)
+        with self._lock:
+            if not self._entries:
+                self.misses += 1
+                return None
+            scores = self._vectors @ vector
+            best = int(np.argmax(scores))
+            entry = self._entries[best]
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+        if not self._is_current(entry):
+            with self._lock:
+                if best < len(self._entries) and self._entries[best] is entry:
+                    self._remove(best)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry["result"]
+
+    def store(self, question, result):
+        """Cache an agent result if every tool it used is a versioned source."""
+        sources = result.get("sources") or []
+        if not sources or any(tool not in SOURCE_VERSIONS for tool, _ in sources):
+            return
+        versions = {source: self._version(*source) for source in sources}
+        if any(version is None for version in versions.values()):
+            return
+        vector = self._embed(question)
+        with self._lock:
+            if self._vectors.shape[1] != vector.shape[0]:
+                self._vectors = np.zeros((0, vector.shape[0]), dtype=np.float32)
+            self._entries.append({"question": question, "result": result, "versions": versions, "created_at": time.time()})
+            self._vectors = np.vstack([self._vectors, vector[None, :]])
+            while len(self._entries) > self.max_entries:
+                self._remove(0)
+
+    def clear(self):
+        with self._lock:
+            self._entries = []
+            self._vectors = np.zeros((0, 0), dtype=np.float32)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_answer_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache():
+    global _answer_cache
+    if _answer_cache is None:
+        with _cache_lock:
+            if _answer_cache is None:
+                _answer_cache = SemanticAnswerCache()
+    return _answer_cache
@@ -0,0 +1,38 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Where a tool sends the tokens of the answer it is generating; set by the streaming agent runner.
+_sink_var = ContextVar("answer_sink", default=None)
+
+
+@contextmanager
+def stream_answers_to(sink):
+    """Within this context (and contexts copied from it, such as tool worker threads), call sink(text) per answer token."""
+    token = _sink_var.set(sink)
+    try:
+        yield
+    finally:
+        _sink_var.reset(token)
+
+
+def _text(chunk):
+    if isinstance(chunk, str):
+        return chunk
+    content = getattr(chunk, "content", "")
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content if isinstance(block, dict) and block.get("type") == "text")
+
+
+def generate(runnable, input):
+    """Invoke a model or chain; while an answer sink is set, stream it and pass the tokens on. Returns the full output."""
+    sink = _sink_var.get()
+    if sink is None:
+        return runnable.invoke(input)
+    output = None
+    for chunk in runnable.stream(input):
+        text = _text(chunk)
+        if text:
+            sink(text)
+        output = chunk if output is None else output + chunk
+    return output
@@ -0,0 +1,94 @@
+from langchain_core.documents import Document
+import os
+
+# Most tokens of retrieved policy text sent to the LLM per question (0 = no cap).
+CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "1500"))
+# A chunk that only partly fits is truncated if at least this many tokens remain, otherwise dropped.
+MIN_PARTIAL_TOKENS = 64
+# The splitter strips the whitespace between back-to-back chunks; gaps up to this size still count as adjacent.
+_MAX_GAP = 2
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
+def _merge_runs(blocks):
+    """Merge blocks from one source page whose character spans overlap or touch."""
+    blocks.sort(key=lambda block: block["start"])
+    merged = [blocks[0]]
+    for block in blocks[1:]:
+        current = merged[-1]
+        if block["start"] > current["end"] + _MAX_GAP:
+            merged.append(block)
+            continue
+        if block["end"] > current["end"]:
+            if block["start"] > current["end"]:
+                current["text"] += "\n" + block["text"]
+            else:
+                current["text"] += block["text"][current["end"] - block["start"]:]
+            current["end"] = block["end"]
+        current["rank"] = min(current["rank"], block["rank"])
+        current["chunks"] += block["chunks"]
+    return merged
+
+
+def _truncate(text, tokens):
+    cut = text[: tokens * 4]
+    boundary = max(cut.rfind(". "), cut.rfind("\n"))
+    if boundary < len(cut) // 2:
+        boundary = cut.rfind(" ")
+    return cut[: boundary + 1].rstrip() + " …" if boundary > 0 else cut + " …"
+
+
+def pack_documents(docs, token_budget=CONTEXT_TOKENS):
+    """Turn ranked chunks into the context actually sent to the LLM.
+
+    Exact duplicates are dropped, overlapping or adjacent chunks of the same page are
+    merged into one passage (using the splitter's `start_index`), and passages are
+    added best-first until `token_budget` is used up. Returns (documents, report).
+    """
+    report = {"chunks": len(docs), "tokens_in": sum(estimate_tokens(doc.page_content) for doc in docs),
+              "duplicates": 0, "merged": 0, "dropped": 0, "truncated": False}
+    seen = set()
+    loose, by_page = [], {}
+    for rank, doc in enumerate(docs):
+        normalized = " ".join(doc.page_content.split())
+        if normalized in seen:
+            report["duplicates"] += 1
+            continue
+        seen.add(normalized)
+        start = doc.metadata.get("start_index")
+        block = {"rank": rank, "text": doc.page_content, "metadata": dict(doc.metadata), "id": doc.id, "chunks": 1}
+        if start is None:
+            loose.append(block)
+            continue
+        block.update(start=start, end=start + len(doc.page_content))
+        by_page.setdefault((doc.metadata.get("source"), doc.metadata.get("page")), []).append(block)
+
+    blocks = loose
+    for page_blocks in by_page.values():
+        merged = _merge_runs(page_blocks)
+        report["merged"] += len(page_blocks) - len(merged)
+        blocks.extend(merged)
+    blocks.sort(key=lambda block: block["rank"])
+
+    packed, remaining = [], token_budget
+    for block in blocks:
+        text = block["text"]
+        tokens = estimate_tokens(text)
+        if token_budget > 0 and tokens > remaining:
+            if remaining < MIN_PARTIAL_TOKENS:
+                report["dropped"] += 1
+                continue
+            text = _truncate(text, remaining)
+            tokens = estimate_tokens(text)
+            report["truncated"] = True
+        remaining -= tokens
+        metadata = {**block["metadata"], "merged_chunks": block["chunks"]}
+        if "start" in block:
+            metadata["start_index"] = block["start"]
+        packed.append(Document(id=block["id"], page_content=text, metadata=metadata))
+    report["tokens_packed"] = sum(estimate_tokens(doc.page_content) for doc in packed)
+    return packed, report
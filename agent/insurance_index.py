@@ -0,0 +1,79 @@
+from agent.mcp_insurance_client import get_insurance_client, run_async
+from providers.embeddings import get_embeddings
+from providers.vectorstore import PERSIST_DIR
+import os
+import threading
+
+COLLECTION_NAME = "insurance_docs"
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 100
+TOP_K = int(os.getenv("INSURANCE_TOP_K", "4"))
+DEFAULT_DOCUMENT_ID = os.getenv("INSURANCE_DOCUMENT_ID", "1Sb3KD3YJldA9ocCE4KK0CdFBEgh3w0JaGdabi83xY3M")
+
+_VECTORSTORE = None
+_lock = threading.Lock()
+
+
+def _get_vectorstore():
+    global _VECTORSTORE
+    if _VECTORSTORE is None:
+        from langchain.vectorstores import Chroma
+
+        os.makedirs(PERSIST_DIR, exist_ok=True)
+        _VECTORSTORE = Chroma(
+            collection_name=COLLECTION_NAME,
+            embedding_function=get_embeddings(),
+            persist_directory=PERSIST_DIR,
+        )
+    return _VECTORSTORE
+
+
+def _indexed_revision(vectorstore, document_id):
+    stored = vectorstore.get(where={"document_id": document_id}, limit=1, include=["metadatas"])
+    metadatas = stored.get("metadatas") or []
+    return metadatas[0].get("revision") if metadatas else None
+
+
+def _reindex(vectorstore, document_id, revision):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    # Errors must propagate: anything returned here is indexed under the document's current revision.
+    content = run_async(get_insurance_client().get_document_content(document_id), raise_errors=True)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    chunks = splitter.create_documents(
+        [content],
+        metadatas=[{"source": f"Insurance document {document_id}", "document_id": document_id, "revision": revision}],
+    )
+    stale = vectorstore.get(where={"document_id": document_id}, include=[])["ids"]
+    if stale:
+        vectorstore.delete(ids=stale)
+    vectorstore.add_documents(chunks, ids=[f"{document_id}:{revision}:{i}" for i in range(len(chunks))])
+    print(f"[Insurance Index] Indexed {document_id} at revision {revision} ({len(chunks)} chunks)")
+
+
+def get_document_revision(document_id=DEFAULT_DOCUMENT_ID):
+    """Current Drive revision of the document, or None if it cannot be determined."""
+    revision = run_async(get_insurance_client().get_document_revision(document_id))
+    if not isinstance(revision, str) or revision.startswith("Error"):
+        return None
+    return revision
+
+
+def ensure_indexed(document_id):
+    """Make sure the document's chunks are indexed at its current revision; return that revision."""
+    revision = get_document_revision(document_id)
+    with _lock:
+        vectorstore = _get_vectorstore()
+        indexed = _indexed_revision(vectorstore, document_id)
+        # If Drive cannot tell us the revision, keep serving whatever is already indexed.
+        if indexed is not None and (revision is None or indexed == revision):
+            return indexed
+        revision = revision or "unknown"
+        _reindex(vectorstore, document_id, revision)
+        return revision
+
+
+def search_insurance_document(document_id, question, k=TOP_K):
+    """Return the k chunks of the document most relevant to the question."""
+    ensure_indexed(document_id)
+    return _get_vectorstore().similarity_search(question, k=k, filter={"document_id": document_id})
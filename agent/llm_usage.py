@@ -0,0 +1,179 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import os
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+from utils import tracing
+
+
+# Bedrock on-demand prices for Claude 3 Sonnet, in USD per 1K tokens.
+INPUT_COST_PER_1K = float(os.getenv("BEDROCK_INPUT_COST_PER_1K", "0.003"))
+OUTPUT_COST_PER_1K = float(os.getenv("BEDROCK_OUTPUT_COST_PER_1K", "0.015"))
+
+MAX_STEPS = int(os.getenv("AGENT_MAX_STEPS", "4"))
+DEADLINE_SECONDS = float(os.getenv("AGENT_DEADLINE_SECONDS", "90"))
+MAX_INPUT_TOKENS = int(os.getenv("AGENT_MAX_INPUT_TOKENS", "30000"))
+MAX_OUTPUT_TOKENS = int(os.getenv("AGENT_MAX_OUTPUT_TOKENS", "4000"))
+
+
+class LLMUsage(BaseCallbackHandler):
+    """Counts the model calls and tokens spent answering one question, including those made inside tools."""
+
+    def __init__(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._lock = threading.Lock()
+
+    def _count(self):
+        with self._lock:
+            self.calls += 1
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self._count()
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._count()
+
+    def on_llm_end(self, response, **kwargs):
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    input_tokens += usage.get("input_tokens", 0)
+                    output_tokens += usage.get("output_tokens", 0)
+        with self._lock:
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+
+    @property
+    def cost(self):
+        return self.input_tokens / 1000 * INPUT_COST_PER_1K + self.output_tokens / 1000 * OUTPUT_COST_PER_1K
+
+
+class ExecutionBudget:
+    """Per-question limits on agent steps (tool-calling turns), wall-clock time and tokens.
+
+    The clock starts when the budget is created. The runner counts steps and asks
+    `exhausted()` before every further model turn.
+    """
+
+    def __init__(self, max_steps=MAX_STEPS, deadline_seconds=DEADLINE_SECONDS,
+                 max_input_tokens=MAX_INPUT_TOKENS, max_output_tokens=MAX_OUTPUT_TOKENS):
+        self.max_steps = max_steps
+        self.deadline_seconds = deadline_seconds
+        self.max_input_tokens = max_input_tokens
+        self.max_output_tokens = max_output_tokens
+        self.started = time.perf_counter()
+        self.steps = 0
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def remaining(self):
+        return max(self.deadline_seconds - self.elapsed, 0.0)
+
+    def out_of_steps(self):
+        return self.steps >= self.max_steps
+
+    def exhausted(self, usage):
+        """Why no further model turn is allowed (time or tokens used up), or None."""
+        if self.remaining() <= 0:
+            return f"time limit ({self.deadline_seconds:.0f}s)"
+        if usage.input_tokens >= self.max_input_tokens:
+            return f"input token limit ({self.max_input_tokens})"
+        if usage.output_tokens >= self.max_output_tokens:
+            return f"output token limit ({self.max_output_tokens})"
+        return None
+
+    def report(self, usage):
+        return {
+            "seconds": round(self.elapsed, 2),
+            "steps": self.steps,
+            "llm_calls": usage.calls,
+            "input_tokens": usage.input_tokens,
+            "output_tokens": usage.output_tokens,
+            "cost_usd": round(usage.cost, 5),
+        }
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Turns LangChain model and retriever runs into tracing spans, nested under the current span."""
+
+    def __init__(self):
+        self._spans = {}
+
+    def _start(self, run_id, name, **attributes):
+        self._spans[run_id] = tracing.start_span(name, **attributes)
+
+    def _end(self, run_id, error=None, **attributes):
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.set(**attributes)
+            span.end(error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        model = (kwargs.get("invocation_params") or {}).get("model") or (serialized or {}).get("name")
+        self._start(run_id, "llm", model=model, messages=sum(len(batch) for batch in messages))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, "llm", model=(serialized or {}).get("name"))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                for key in ("input_tokens", "output_tokens"):
+                    usage[key] = usage.get(key, 0) + metadata.get(key, 0)
+        self._end(run_id, **usage)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self._start(run_id, "retrieval", retriever=(serialized or {}).get("name"))
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id, documents=len(documents))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+
+# Always set, so every LangChain run in the process is traced.
+_tracing_var = ContextVar("llm_tracing", default=TracingCallbackHandler() if tracing.ENABLED else None)
+register_configure_hook(_tracing_var, inheritable=True)
+
+_usage_var = ContextVar("llm_usage", default=None)
+# Every LangChain run started in this context (the agent, the RAG chain, tool-internal LLM
+# calls on worker threads with a copied context) reports to the active LLMUsage.
+register_configure_hook(_usage_var, inheritable=True)
+
+
+@contextmanager
+def track_llm_usage():
+    usage = LLMUsage()
+    token = _usage_var.set(usage)
+    try:
+        yield usage
+    finally:
+        try:
+            _usage_var.reset(token)
+        except ValueError:
+            # A streaming generator closed from another context; the variable dies with it.
+            pass
+
+
+def format_usage(report):
+    """One-line summary of a question's usage report, for the chat footer."""
+    parts = [f"{report['seconds']:.1f}s", f"{report['llm_calls']} LLM call{'s' if report['llm_calls'] != 1 else ''}"]
+    if report["input_tokens"] or report["output_tokens"]:
+        parts.append(f"{report['input_tokens']:,} in / {report['output_tokens']:,} out tokens")
+        parts.append(f"~${report['cost_usd']:.4f}")
+    return " · ".join(parts)
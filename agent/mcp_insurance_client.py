@@ -1,106 +1,224 @@
 import asyncio
+import atexit
+import contextvars
 import os
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+import threading
+import time
+from contextlib import AsyncExitStack
+from utils import tracing
 
 
 class MCPInsuranceClient:
+    """Client for the insurance MCP server backed by a small pool of warm sessions.
+
+    Each pool worker owns one `mcp_server.py` subprocess and its session for as long
+    as it stays healthy, pulling tool calls off a shared queue. Idle sessions are
+    pinged before reuse, and a worker whose session breaks restarts the subprocess.
+    """
+
     def __init__(self):
-        current_dir = os.getcwd()
+        from mcp import StdioServerParameters
+
+        server_script = os.getenv("MCP_SERVER_SCRIPT", os.path.join(os.getcwd(), "mcp_server.py"))
         self.server_params = StdioServerParameters(
             command="python",
-            args=[os.path.join(current_dir, "mcp_server.py")],
-            env=None,
+            args=[server_script],
+            # Added to the default environment, so the server writes its spans alongside ours.
+            env={key: value for key, value in os.environ.items() if key.startswith("TRACE")} or None,
         )
-        print(f"[MCP Client] Initialized with server path: {os.path.join(current_dir, 'mcp_server.py')}")
+        self.pool_size = int(os.getenv("MCP_POOL_SIZE", "2"))
+        self.call_timeout = float(os.getenv("MCP_CALL_TIMEOUT", "30"))
+        self.health_check_interval = float(os.getenv("MCP_HEALTH_CHECK_INTERVAL", "60"))
+        self.max_pending = int(os.getenv("MCP_MAX_PENDING", "32"))
+        self._queue = None
+        self._workers = []
+        print(f"[MCP Client] Initialized with server path: {server_script} (pool size {self.pool_size})")
+
+    def _ensure_workers(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.pool_size:
+            worker_id = len(self._workers)
+            # A fresh context: workers outlive the call that started them, so their spans are roots.
+            self._workers.append(asyncio.create_task(self._worker(worker_id), context=contextvars.Context()))
+
+    async def _worker(self, worker_id: int):
+        from mcp import ClientSession
+        from mcp.client.stdio import stdio_client
+
+        backoff = 1.0
+        while True:
+            try:
+                print(f"[MCP Client] Worker {worker_id}: starting server process...")
+                async with AsyncExitStack() as stack:
+                    with tracing.span("mcp.spawn", worker=worker_id):
+                        read_stream, write_stream = await stack.enter_async_context(stdio_client(self.server_params))
+                        session = await stack.enter_async_context(ClientSession(read_stream, write_stream))
+                    with tracing.span("mcp.initialize", worker=worker_id):
+                        await session.initialize()
+                    print(f"[MCP Client] Worker {worker_id}: session initialized")
+                    backoff = 1.0
+                    await self._serve(worker_id, session)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[MCP Client] Worker {worker_id}: session failed ({type(e).__name__}: {e}), restarting in {backoff:.0f}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    async def _serve(self, worker_id: int, session):
+        from mcp.shared.exceptions import McpError
+        from mcp.types import CONNECTION_CLOSED
+
+        last_used = time.monotonic()
+        while True:
+            tool_name, arguments, future, attempt, parent = await self._queue.get()
+            if future.done():
+                continue
+            if time.monotonic() - last_used > self.health_check_interval:
+                try:
+                    await asyncio.wait_for(session.send_ping(), timeout=5)
+                except Exception as e:
+                    # Hand the call to the next healthy session and restart this one.
+                    self._requeue(tool_name, arguments, future, attempt, parent, e)
+                    raise
+            try:
+                # The worker task outlives requests; parent its span to the caller's.
+                with tracing.use_span(parent), tracing.span("mcp.session.call_tool", worker=worker_id, tool=tool_name, attempt=attempt):
+                    result = await asyncio.wait_for(session.call_tool(tool_name, arguments), timeout=self.call_timeout)
+            except asyncio.TimeoutError as e:
+                # A slow tool call is not a broken session; fail just this call (its late reply is dropped).
+                if not future.done():
+                    future.set_exception(e)
+                last_used = time.monotonic()
+                continue
+            except McpError as e:
+                if e.error.code != CONNECTION_CLOSED:
+                    # Tool/protocol errors leave the session usable.
+                    if not future.done():
+                        future.set_exception(e)
+                    last_used = time.monotonic()
+                    continue
+                self._fail_or_retry(tool_name, arguments, future, attempt, parent, e)
+                raise
+            except Exception as e:
+                self._fail_or_retry(tool_name, arguments, future, attempt, parent, e)
+                raise
+            else:
+                if not future.done():
+                    future.set_result(result)
+            last_used = time.monotonic()
+
+    def _fail_or_retry(self, tool_name, arguments, future, attempt, parent, error):
+        """The session died under a call: retry it once on another session (the tools are read-only)."""
+        if future.done():
+            return
+        if attempt < 1:
+            self._requeue(tool_name, arguments, future, attempt + 1, parent, error)
+        else:
+            future.set_exception(error)
+
+    def _requeue(self, tool_name, arguments, future, attempt, parent, error):
+        """Put a call back on the queue, failing it instead if the queue is full."""
+        try:
+            self._queue.put_nowait((tool_name, arguments, future, attempt, parent))
+        except asyncio.QueueFull:
+            if not future.done():
+                future.set_exception(error)
+
+    async def call_tool(self, tool_name: str, arguments: dict):
+        with tracing.span("mcp.call", tool=tool_name) as span:
+            self._ensure_workers()
+            span.set(queued=self._queue.qsize())
+            future = asyncio.get_running_loop().create_future()
+            await self._queue.put((tool_name, arguments, future, 0, tracing.current_span()))
+            return await asyncio.wait_for(future, timeout=self.call_timeout * 2)
 
     async def get_document_content(self, document_id: str) -> str:
+        """Text of a document. Raises RuntimeError if the server returned no document."""
         print(f"[MCP Client] Getting document content for ID: {document_id}")
-
+        result = await self.call_tool("get_document_content", {"document_id": document_id})
+        content = result.content[0] if result.content else None
+        if content is None or getattr(content, "type", None) != "text":
+            raise RuntimeError("No document content in server response")
+        # The server reports failures (no credentials, unknown document) as "Error: ..." text.
+        if result.isError or not content.text or content.text.startswith("Error"):
+            raise RuntimeError(content.text or "Empty document content")
+        print(f"[MCP Client] Retrieved content length: {len(content.text)}")
+        return content.text
+
+    async def get_document_revision(self, document_id: str) -> str | None:
+        """Current revision of a document, or None if the server could not determine it."""
         try:
-            print(f"[MCP Client] Creating fresh connection...")
-            stdio_ctx = stdio_client(self.server_params)
-            read_stream, write_stream = await stdio_ctx.__aenter__()
-            print(f"[MCP Client] Got read/write streams")
-
-            session = await ClientSession(read_stream, write_stream).__aenter__()
-            print(f"[MCP Client] Session created")
-
-            await session.initialize()
-            print(f"[MCP Client] Session initialized")
-
-            print(f"[MCP Client] Calling get_document_content tool...")
-            result = await session.call_tool("get_document_content", {"document_id": document_id})
-            print(f"[MCP Client] Got result: {result}")
-
-            if result.content and len(result.content) > 0:
-                content = result.content[0]
-                print(f"[MCP Client] Content type: {type(content)}")
-
-                if hasattr(content, 'text') and hasattr(content, 'type') and content.type == "text":
-                    print(f"[MCP Client] Retrieved content length: {len(content.text)}")
-                    return content.text
-                else:
-                    return "Invalid response format from server"
-            else:
-                return "No response from server"
-
+            result = await self.call_tool("get_document_revision", {"document_id": document_id})
         except Exception as e:
-            print(f"[MCP Client] Get document exception: {e}")
-            print(f"[MCP Client] Exception type: {type(e).__name__}")
-            import traceback
-            traceback.print_exc()
-            return f"Error retrieving document: {str(e)}"
-        finally:
-            try:
-                if 'session' in locals():
-                    await session.__aexit__(None, None, None)
-                    print(f"[MCP Client] Session closed")
-                if 'stdio_ctx' in locals():
-                    await stdio_ctx.__aexit__(None, None, None)
-                    print(f"[MCP Client] Stdio context closed")
-            except Exception as cleanup_error:
-                print(f"[MCP Client] Cleanup error: {cleanup_error}")
+            print(f"[MCP Client] Get revision exception: {type(e).__name__}: {e}")
+            return None
+        if result.content and getattr(result.content[0], "type", None) == "text":
+            return result.content[0].text or None
+        return None
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
 
 
 _insurance_client = None
+_client_lock = threading.Lock()
+
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
 
 
 def get_insurance_client() -> MCPInsuranceClient:
     global _insurance_client
     if _insurance_client is None:
-        _insurance_client = MCPInsuranceClient()
+        with _client_lock:
+            if _insurance_client is None:
+                _insurance_client = MCPInsuranceClient()
     return _insurance_client
 
 
-def run_async(coro):
+def _get_loop():
+    """Return the process-wide event loop that owns the MCP sessions."""
+    global _loop, _loop_thread
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                _loop_thread = threading.Thread(target=loop.run_forever, name="mcp-client-loop", daemon=True)
+                _loop_thread.start()
+                _loop = loop
+    return _loop
+
+
+async def _in_span(parent, coro):
+    with tracing.use_span(parent):
+        return await coro
+
+
+def run_async(coro, timeout: float = 60, raise_errors: bool = False):
+    """Run a client coroutine on the shared loop. Failures come back as an "Error: ..." string unless raise_errors is set."""
     try:
-        import concurrent.futures
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future = executor.submit(_run_in_new_loop, coro)
-            return future.result(timeout=30)
+        # The loop thread does not share the caller's context; carry the current span over.
+        future = asyncio.run_coroutine_threadsafe(_in_span(tracing.current_span(), coro), _get_loop())
+        return future.result(timeout=timeout)
     except Exception as e:
         print(f"Error in async operation: {e}")
+        if raise_errors:
+            raise
         return f"Error: {str(e)}"
 
 
-def _run_in_new_loop(coro):
-    """Run coroutine in a new event loop."""
+@atexit.register
+def _shutdown():
+    if _loop is None or _insurance_client is None:
+        return
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            return loop.run_until_complete(coro)
-        finally:
-            try:
-                pending = asyncio.all_tasks(loop)
-                for task in pending:
-                    task.cancel()
-                if pending:
-                    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
-            except:
-                pass
-            loop.close()
-    except Exception as e:
-        print(f"Error in new loop: {e}")
-        return f"Error: {str(e)}"
\ No newline at end of file
+        asyncio.run_coroutine_threadsafe(_insurance_client.close(), _loop).result(timeout=5)
+    except Exception:
+        pass
@@ -0,0 +1,109 @@
+from agent.answer_stream import generate
+from agent.context_packer import estimate_tokens, pack_documents
+from providers.bedrock import get_llm
+from providers.vectorstore import RETRIEVER_K, get_retriever
+import os
+import threading
+
+# Cosine similarity between question and chunk; MiniLM puts on-topic chunks roughly above 0.35.
+SCORE_THRESHOLD = float(os.getenv("RAG_SCORE_THRESHOLD", "0.35"))
+# Adaptive k: chunks scoring this far below the best one are dropped even if above the threshold.
+SCORE_MARGIN = float(os.getenv("RAG_SCORE_MARGIN", "0.15"))
+# The same two cut-offs for reranked chunks, on the cross-encoder's scale (ms-marco logits; above 0 reads as relevant).
+RERANK_THRESHOLD = float(os.getenv("RAG_RERANK_THRESHOLD", "0"))
+RERANK_MARGIN = float(os.getenv("RAG_RERANK_MARGIN", "5"))
+
+NO_MATCH_ANSWER = "I couldn't find anything in the HR policy documents that answers this question."
+
+_QA_CHAIN = None
+_lock = threading.Lock()
+_stats = {"questions": 0, "retrieved": 0, "kept": 0, "tokens_sent": 0, "tokens_saved": 0, "llm_input_tokens": 0, "llm_output_tokens": 0}
+_stats_lock = threading.Lock()
+
+
+def get_qa_chain():
+    """Return the shared "stuff" QA chain; documents are passed in per call, so it holds no retriever.
+
+    It takes {"context": documents, "question": ...} and returns the answer text; as a
+    plain runnable it can also stream that answer.
+    """
+    global _QA_CHAIN
+    if _QA_CHAIN is None:
+        with _lock:
+            if _QA_CHAIN is None:
+                from langchain.chains.combine_documents import create_stuff_documents_chain
+                from langchain.chains.question_answering.stuff_prompt import PROMPT_SELECTOR
+
+                llm = get_llm()
+                _QA_CHAIN = create_stuff_documents_chain(llm, PROMPT_SELECTOR.get_prompt(llm))
+    return _QA_CHAIN
+
+
+def _above_cutoff(docs, key, threshold, margin):
+    scores = [doc.metadata[key] for doc in docs if doc.metadata.get(key) is not None]
+    if not scores:
+        return docs
+    cutoff = max(threshold, max(scores) - margin)
+    return [doc for doc in docs if doc.metadata.get(key) is not None and doc.metadata[key] >= cutoff]
+
+
+def _filter_by_score(docs):
+    """Keep the chunks relevant enough to send to the LLM, in retrieval order.
+
+    Reranked chunks are judged by their cross-encoder score, so the filter agrees
+    with the reranker. Otherwise chunks need a cosine similarity above the threshold
+    and within SCORE_MARGIN of the best one, except that chunks BM25 ranked in its
+    top k are always kept: exact-term matches ("LTA", "Form 16") often embed poorly.
+    """
+    if any(doc.metadata.get("rerank_score") is not None for doc in docs):
+        return _above_cutoff(docs, "rerank_score", RERANK_THRESHOLD, RERANK_MARGIN)
+    similar = {id(doc) for doc in _above_cutoff(docs, "score", SCORE_THRESHOLD, SCORE_MARGIN)}
+    return [doc for doc in docs if id(doc) in similar or doc.metadata.get("lexical_rank", RETRIEVER_K) < RETRIEVER_K]
+
+
+def _record(stats):
+    with _stats_lock:
+        _stats["questions"] += 1
+        for key in ("retrieved", "kept", "tokens_sent", "tokens_saved", "llm_input_tokens", "llm_output_tokens"):
+            _stats[key] += stats.get(key, 0)
+    print(
+        f"[RAG] Kept {stats['kept']}/{stats['retrieved']} chunks as {stats['passages']} passages "
+        f"({stats['tokens_sent']} context tokens sent, ~{stats['tokens_saved']} saved; "
+        f"LLM in/out {stats.get('llm_input_tokens', 0)}/{stats.get('llm_output_tokens', 0)})"
+    )
+
+
+def get_retrieval_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def answer_question(query):
+    """Retrieve once, then answer from the chunks that pass the score filter, packed to the token budget.
+
+    Returns (answer, source_documents, stats), where stats account for the tokens
+    of this request. If no chunk is relevant enough the LLM is not called at all.
+    """
+    from langchain_core.callbacks import get_usage_metadata_callback
+
+    retrieved = get_retriever().invoke(query)
+    docs, packing = pack_documents(_filter_by_score(retrieved))
+    tokens_retrieved = sum(estimate_tokens(doc.page_content) for doc in retrieved)
+    stats = {
+        "retrieved": len(retrieved),
+        "kept": packing["chunks"],
+        "passages": len(docs),
+        "packing": packing,
+        "tokens_sent": packing["tokens_packed"],
+        "tokens_saved": tokens_retrieved - packing["tokens_packed"],
+    }
+    if docs:
+        with get_usage_metadata_callback() as usage:
+            answer = generate(get_qa_chain(), {"context": docs, "question": query}) or ""
+        for model_usage in usage.usage_metadata.values():
+            stats["llm_input_tokens"] = stats.get("llm_input_tokens", 0) + model_usage.get("input_tokens", 0)
+            stats["llm_output_tokens"] = stats.get("llm_output_tokens", 0) + model_usage.get("output_tokens", 0)
+    else:
+        answer = NO_MATCH_ANSWER
+    _record(stats)
+    return answer, docs, stats
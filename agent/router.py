@@ -0,0 +1,191 @@
+import os
+import re
+import threading
+import time
+import numpy as np
+from providers.embeddings import get_embeddings
+
+ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() in ("1", "true", "yes")
+MIN_SIMILARITY = float(os.getenv("ROUTER_MIN_SIMILARITY", "0.55"))
+MIN_MARGIN = float(os.getenv("ROUTER_MIN_MARGIN", "0.05"))
+
+# Label for questions the router must leave to the agent (greetings, introductions, small talk).
+AGENT = "agent"
+
+# Mirrors the tool rules in agent/prompts.py.
+KEYWORD_RULES = [
+    ("websearch_tool", re.compile(
+        r"\b(news|industry|best practices?|trends?)\b|\b(latest|recent|current)\b.*\b(updates?|regulations?|laws?)\b",
+        re.IGNORECASE)),
+    ("insurance_query_tool", re.compile(
+        r"\b(insurance|insured|deductibles?|premiums?|co-?pays?|co-?insurance|mediclaim|dental|vision|policy holder|sum insured|cashless)\b",
+        re.IGNORECASE)),
+]
+
+EXAMPLES = {
+    "rag_tool": [
+        "Can I reimburse my electricity bill when working from home?",
+        "How many paid leaves do I get per year?",
+        "What is the notice period when I resign?",
+        "How do I apply for maternity leave?",
+        "What is the work from home policy?",
+        "Can I carry forward unused leave to next year?",
+        "How do I claim LTA?",
+        "When does my ESOP vesting start?",
+        "What is the travel reimbursement limit for client visits?",
+        "Is there a dress code at the office?",
+        "How are performance appraisals done?",
+        "What holidays does the company observe?",
+    ],
+    "websearch_tool": [
+        "What is the latest government regulation on remote work reimbursement in California?",
+        "What are the current best practices for employee wellness programs in the tech industry?",
+        "What was the latest news on Bangalore work life policy?",
+        "What are industry trends in hybrid work for 2024?",
+        "How do other tech companies handle four day work weeks?",
+        "What is the minimum wage in Karnataka this year?",
+        "Recent updates to labour laws in India",
+        "What does the new EU pay transparency directive require?",
+    ],
+    "insurance_query_tool": [
+        "What is covered under my health insurance plan?",
+        "What is the deductible for my vision insurance?",
+        "Are my parents covered under the medical insurance?",
+        "How do I file a hospitalization claim?",
+        "Is maternity covered in the group health policy?",
+        "What is the sum insured per family?",
+        "Does the policy cover dental treatment?",
+        "Which hospitals offer cashless treatment?",
+    ],
+    AGENT: [
+        "Hi",
+        "Hello there",
+        "My name is Sathish",
+        "Who are you?",
+        "What can you do?",
+        "Thanks, that helps",
+        "Good morning",
+    ],
+}
+
+
+class QueryRouter:
+    """Picks the tool for a question locally, so the agent can skip its tool-selection turn.
+
+    A nearest-example classifier over embedded EXAMPLES picks a label, and keyword
+    rules act as a check on it: a question is only dispatched directly when the
+    classifier is confident and any keyword match agrees with it. Keywords alone
+    are too broad ("company vision", "industry best practices for our appraisals").
+    Everything else goes to the LLM agent as before.
+    """
+
+    def __init__(self, examples=EXAMPLES, min_similarity=MIN_SIMILARITY, min_margin=MIN_MARGIN):
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self._embeddings = get_embeddings()
+        self._labels = [label for label, questions in examples.items() for _ in questions]
+        self._questions = [question for questions in examples.values() for question in questions]
+        self._vectors = self._normalize(self._embeddings.embed_documents(self._questions))
+        self._lock = threading.Lock()
+        self._stats = {"routed": 0, "fallbacks": 0, "compared": 0, "agreed": 0, "selection_seconds": 0.0, "selections": 0, "router_seconds": 0.0}
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    @staticmethod
+    def keyword_route(question):
+        matches = {tool for tool, pattern in KEYWORD_RULES if pattern.search(question)}
+        return matches.pop() if len(matches) == 1 else None
+
+    def _classify(self, vector, exclude=None):
+        """Best label by nearest example, with its similarity and the margin over the best other label."""
+        scores = self._vectors @ vector
+        if exclude is not None:
+            scores[exclude] = -1.0
+        best = {}
+        for label, score in zip(self._labels, scores):
+            best[label] = max(best.get(label, -1.0), float(score))
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        label, score = ranked[0]
+        return label, score, score - (ranked[1][1] if len(ranked) > 1 else -1.0)
+
+    def _decide(self, keyword, label, score, margin):
+        confident = score >= self.min_similarity and margin >= self.min_margin
+        if not confident:
+            return None, "uncertain"
+        if keyword is not None:
+            if label != keyword:
+                return None, "keyword and similarity disagree"
+            return keyword, "keyword and similarity"
+        if label != AGENT:
+            return label, "similarity"
+        return None, "small talk"
+
+    def route(self, question):
+        """Return {"tool", "reason", "guess", "score", "margin"}; "tool" is None when the agent should decide."""
+        started = time.perf_counter()
+        vector = self._normalize(self._embeddings.embed_query(question))
+        keyword = self.keyword_route(question)
+        label, score, margin = self._classify(vector)
+        tool, reason = self._decide(keyword, label, score, margin)
+        with self._lock:
+            self._stats["routed" if tool else "fallbacks"] += 1
+            self._stats["router_seconds"] += time.perf_counter() - started
+        return {"tool": tool, "reason": reason, "guess": keyword or label, "score": round(score, 3), "margin": round(margin, 3)}
+
+    def record_agent_choice(self, route, chosen_tool, seconds):
+        """Record what the agent picked for a question the router left to it, and how long a tool pick took."""
+        with self._lock:
+            if chosen_tool is not None:
+                self._stats["selections"] += 1
+                self._stats["selection_seconds"] += seconds
+            if route.get("guess") is not None:
+                self._stats["compared"] += 1
+                self._stats["agreed"] += int(route["guess"] == (chosen_tool or AGENT))
+
+    def evaluate(self):
+        """Leave-one-out accuracy of the router over its own labeled examples."""
+        correct = routed = 0
+        for i, (question, expected) in enumerate(zip(self._questions, self._labels)):
+            tool, _ = self._decide(self.keyword_route(question), *self._classify(self._vectors[i], exclude=i))
+            if tool is not None:
+                routed += 1
+                correct += int(tool == expected)
+        return {"examples": len(self._questions), "routed": routed, "correct": correct, "accuracy": round(correct / routed, 3) if routed else None}
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+        avg_selection = s["selection_seconds"] / s["selections"] if s["selections"] else None
+        return {
+            "routed": s["routed"],
+            "fallbacks": s["fallbacks"],
+            # How often the router's tentative guess matched the agent's choice on questions it passed on.
+            "shadow_accuracy": round(s["agreed"] / s["compared"], 3) if s["compared"] else None,
+            "avg_router_ms": round(s["router_seconds"] / (s["routed"] + s["fallbacks"]) * 1000, 1) if s["routed"] + s["fallbacks"] else None,
+            "avg_agent_selection_s": round(avg_selection, 2) if avg_selection is not None else None,
+            "estimated_seconds_saved": round(s["routed"] * avg_selection, 1) if avg_selection is not None else None,
+        }
+
+
+_ROUTER = None
+_lock = threading.Lock()
+
+
+def get_router():
+    """Return the shared router, or None when ROUTER_ENABLED is off."""
+    global _ROUTER
+    if not ENABLED:
+        return None
+    if _ROUTER is None:
+        with _lock:
+            if _ROUTER is None:
+                _ROUTER = QueryRouter()
+    return _ROUTER
+
+
+if __name__ == "__main__":
+    print(QueryRouter().evaluate())
@@ -1,51 +1,23 @@
-from langchain.tools import tool
-from providers.vectorstore import get_retriever
+from langchain_core.tools import tool
 from providers.bedrock import get_llm
 from providers.websearch import web_search
-from langchain.chains import RetrievalQA
+from agent.answer_stream import generate
+from agent.rag import answer_question
 from agent.mcp_insurance_client import get_insurance_client, run_async
+from agent.insurance_index import DEFAULT_DOCUMENT_ID, search_insurance_document
 
 @tool
 def rag_tool(query: str) -> dict:
     """Search internal HR policy documents using RAG (Retrieval-Augmented Generation) to answer questions about company policies."""
-    retriever = get_retriever()
-    llm = get_llm()
-    try:
-        docs_with_scores = retriever.get_relevant_documents(query)
-        filtered_docs = []
-        for doc in docs_with_scores:
-            score = None
-            if hasattr(doc, 'metadata') and 'score' in doc.metadata:
-                score = doc.metadata['score']
-            if score is not None:
-                if score >= 0.7:
-                    filtered_docs.append(doc)
-            else:
-                filtered_docs.append(doc)
-        qa_chain = RetrievalQA.from_chain_type(
-            llm=llm,
-            chain_type="stuff",
-            retriever=retriever,
-            return_source_documents=True
-        )
-        result = qa_chain({"query": query, "input_documents": filtered_docs})
-    except Exception:
-        qa_chain = RetrievalQA.from_chain_type(
-            llm=llm,
-            chain_type="stuff",
-            retriever=retriever,
-            return_source_documents=True
-        )
-        result = qa_chain({"query": query})
-    answer = result.get("result") or result.get("output") or ""
-    sources = result.get("source_documents", [])
+    answer, sources, stats = answer_question(query)
     citations = []
     for doc in sources:
         meta = getattr(doc, 'metadata', {})
         name = meta.get('source', 'Unknown Source')
         citations.append(name)
     citations = list(dict.fromkeys(citations))
-    return {"answer": answer, "tool": "RAG", "citations": citations}
+    # With supporting documents the chain's answer is complete; the agent need not restate it.
+    return {"answer": answer, "tool": "RAG", "citations": citations, "final": bool(sources), "debug": stats}
 
 @tool
 def websearch_tool(query: str) -> dict:
@@ -56,38 +28,40 @@ def websearch_tool(query: str) -> dict:
     return {"answer": answer, "tool": "WebSearch", "citations": citations}
 
 @tool
-def insurance_query_tool(question: str, document_id: str = "1Sb3KD3YJldA9ocCE4KK0CdFBEgh3w0JaGdabi83xY3M") -> dict:
+def insurance_query_tool(question: str, document_id: str = DEFAULT_DOCUMENT_ID) -> dict:
     """Query insurance policy documents from Google Drive to answer specific insurance-related questions for Presidio employees."""
     try:
-        client = get_insurance_client()
-        content = run_async(client.get_document_content(document_id))
-
-        if not content or (isinstance(content, str) and "error" in content.lower()):
-            return {"answer": f"Could not retrieve document content: {content}", "tool": "InsuranceQuery", "citations": []}
+        chunks = search_insurance_document(document_id, question)
+        if not chunks:
+            return {"answer": "Could not find relevant sections in the insurance document.", "tool": "InsuranceQuery", "citations": [], "error": True}
 
+        context = "\n\n---\n\n".join(chunk.page_content for chunk in chunks)
         llm = get_llm()
-        prompt = f"""You are an insurance policy expert. Here is the content of the insurance policy document:
+        prompt = f"""You are an insurance policy expert. Here are the sections of the insurance policy document most relevant to the question:
 
-{content}
+{context}
 
 Question: {question}
 
-Please answer the question based only on the information in the document above. If the information is not available, state that clearly."""
+Please answer the question based only on the information in the sections above. If the information is not available, state that clearly."""
 
-        answer = llm.invoke(prompt)
+        answer = generate(llm, prompt)
 
         return {
-            "answer": answer,
+            "answer": answer.content,
             "tool": "InsuranceQuery",
             "citations": [],  # Remove document ID from citations
+            "final": True,
             "debug": {
                 "document_id": document_id,
-                "content_length": len(content) if isinstance(content, str) else 0
+                "revision": chunks[0].metadata.get("revision"),
+                "chunks": len(chunks),
+                "context_length": len(context)
             }
         }
 
     except Exception as e:
-        return {"answer": f"Error querying insurance documents: {str(e)}", "tool": "InsuranceQuery", "citations": []}
+        return {"answer": f"Error querying insurance documents: {str(e)}", "tool": "InsuranceQuery", "citations": [], "error": True}
 
 @tool
 def insurance_document_tool(document_id: str) -> dict:
@@ -102,7 +76,7 @@ def insurance_document_tool(document_id: str) -> dict:
 
         return {"answer": content or "No content retrieved", "tool": "InsuranceDocument", "citations": [f"Document ID: {document_id}"]}
     except Exception as e:
-        return {"answer": f"Error retrieving document: {str(e)}", "tool": "InsuranceDocument", "citations": []}
+        return {"answer": f"Error retrieving document: {str(e)}", "tool": "InsuranceDocument", "citations": [], "error": True}
 
 def get_tools():
     return [rag_tool, websearch_tool, insurance_query_tool, insurance_document_tool]
\ No newline at end of file
@@ -0,0 +1,142 @@
+"""Deterministic synthetic HR policy corpus, insurance document and question mix for benchmarks."""
+import os
+import random
+
+# (file stem, title, keywords used in the text, question about it)
+HR_TOPICS = [
+    ("leave_policy", "Leave Policy", ["paid leave", "casual leave", "sick leave", "carry forward"], "How many paid leaves do I get per year?"),
+    ("work_from_home", "Work From Home Policy", ["remote work", "home office", "internet reimbursement", "core hours"], "Can I reimburse my internet bill when working from home?"),
+    ("travel_policy", "Travel and Expense Policy", ["client visit", "per diem", "airfare", "hotel stay"], "What is the travel reimbursement limit for client visits?"),
+    ("notice_period", "Separation and Notice Period", ["resignation", "notice period", "exit interview", "full and final settlement"], "What is the notice period when I resign?"),
+    ("maternity_leave", "Parental Leave Policy", ["maternity leave", "paternity leave", "adoption leave", "return to work"], "How do I apply for maternity leave?"),
+    ("performance_review", "Performance Appraisal Policy", ["appraisal cycle", "self assessment", "rating", "promotion"], "How are performance appraisals done?"),
+    ("holidays", "Holiday Calendar Policy", ["public holidays", "floating holiday", "regional holidays", "compensatory off"], "What holidays does the company observe?"),
+    ("dress_code", "Dress Code Policy", ["business casual", "client meetings", "casual Fridays", "safety shoes"], "Is there a dress code at the office?"),
+    ("esop", "Employee Stock Option Plan", ["vesting schedule", "grant date", "exercise price", "cliff"], "When does my ESOP vesting start?"),
+    ("lta", "Leave Travel Allowance", ["leave travel allowance", "block year", "travel proof", "tax exemption"], "How do I claim LTA?"),
+    ("code_of_conduct", "Code of Conduct", ["conflict of interest", "gifts", "confidential information", "whistleblower"], "Can I accept gifts from a vendor?"),
+    ("learning", "Learning and Development Policy", ["training budget", "certification", "conference", "study leave"], "Will the company pay for my certification exam?"),
+]
+
+REGIONS = ["India", "United States", "United Kingdom", "Singapore", "Germany"]
+
+INSURANCE_QUESTIONS = [
+    "What is covered under my health insurance plan?",
+    "What is the deductible for my vision insurance?",
+    "Are my parents covered under the medical insurance?",
+    "Is dental treatment covered by the insurance policy?",
+    "Which hospitals offer cashless treatment under the insurance?",
+    "What is the sum insured per family?",
+]
+
+WEB_QUESTIONS = [
+    "What is the latest news on remote work regulations in India?",
+    "What are the current best practices for employee wellness programs in the tech industry?",
+    "What are the industry trends in hybrid work this year?",
+    "What are the recent updates to labour laws in Karnataka?",
+]
+
+SMALL_TALK = ["Hi", "Who are you?", "Thanks, that helps"]
+
+# Share of each kind of question in the end-to-end mix.
+QUESTION_MIX = {"hr": 0.6, "insurance": 0.2, "web": 0.15, "small_talk": 0.05}
+
+_FILLER = [
+    "Employees should read this section together with the applicable local addendum.",
+    "Managers are responsible for applying this policy consistently within their teams.",
+    "Requests are submitted through the HR portal and approved by the reporting manager.",
+    "Exceptions require written approval from the HR business partner.",
+    "Records are retained for audit purposes as required by law.",
+    "Questions about this section can be raised with the People Operations team.",
+]
+
+
+def _section(rng, title, keyword, region):
+    days = rng.choice([5, 7, 10, 12, 15, 18, 20, 24, 30])
+    amount = rng.choice([500, 1000, 1500, 2500, 5000, 10000])
+    sentences = [
+        f"In {region}, the rules for {keyword} under the {title} apply to all full-time employees after their probation period.",
+        f"Eligible employees may use {keyword} for up to {days} working days in a calendar year, subject to business needs.",
+        f"Claims related to {keyword} are reimbursed up to {amount} in local currency once supporting documents are submitted.",
+    ]
+    sentences += rng.sample(_FILLER, 3)
+    rng.shuffle(sentences)
+    return " ".join(sentences)
+
+
+def hr_document(index, seed=0):
+    """Text of synthetic policy file `index`: one topic, one region, a dozen or so sections."""
+    _, title, keywords, _ = HR_TOPICS[index % len(HR_TOPICS)]
+    region = REGIONS[(index // len(HR_TOPICS)) % len(REGIONS)]
+    rng = random.Random(f"{seed}:{index}")
+    parts = [f"{title} ({region})", f"Version {1 + index // (len(HR_TOPICS) * len(REGIONS))}.0", ""]
+    for number in range(1, rng.randint(10, 16)):
+        keyword = keywords[number % len(keywords)]
+        parts.append(f"{number}. {keyword.title()}")
+        parts.append(_section(rng, title, keyword, region))
+        parts.append("")
+    return "\n".join(parts)
+
+
+def hr_filename(index):
+    stem = HR_TOPICS[index % len(HR_TOPICS)][0]
+    region = REGIONS[(index // len(HR_TOPICS)) % len(REGIONS)].lower().replace(" ", "_")
+    return f"{stem}_{region}_{index:04d}.txt"
+
+
+def write_hr_corpus(directory, count, seed=0):
+    """Write `count` policy files into `directory`; returns the total number of characters written."""
+    os.makedirs(directory, exist_ok=True)
+    total = 0
+    for index in range(count):
+        text = hr_document(index, seed)
+        with open(os.path.join(directory, hr_filename(index)), "w") as f:
+            f.write(text)
+        total += len(text)
+    return total
+
+
+def insurance_document(seed=0):
+    """A group health insurance policy covering the topics of INSURANCE_QUESTIONS."""
+    rng = random.Random(f"{seed}:insurance")
+    sections = [
+        ("Sum Insured", "The sum insured is {amount} per family per policy year, shared by the employee, spouse and up to two children."),
+        ("Parents Cover", "Dependent parents can be added at enrolment with a separate sum insured of {amount} and a co-pay of {pct} percent."),
+        ("Deductible", "A deductible of {small} applies to outpatient claims; vision insurance has a separate deductible of {small} per year."),
+        ("Dental", "Dental treatment is covered up to {small} per year when it follows an accident or is medically necessary."),
+        ("Maternity", "Maternity expenses are covered up to {amount_low} for the first two deliveries, including pre and post natal care."),
+        ("Cashless Treatment", "Cashless treatment is available at network hospitals listed on the insurer portal; pre-authorisation is required."),
+        ("Claims", "Reimbursement claims must be filed within {days} days of discharge with the discharge summary and original bills."),
+        ("Exclusions", "Cosmetic procedures, experimental treatments and self-inflicted injuries are not covered by the policy."),
+    ]
+    parts = ["Group Health Insurance Policy", ""]
+    for title, template in sections * 3:
+        parts.append(title)
+        parts.append(template.format(
+            amount=rng.choice([300000, 500000, 700000]), amount_low=rng.choice([50000, 75000]),
+            small=rng.choice([2000, 5000, 7500]), pct=rng.choice([10, 20]), days=rng.choice([15, 30]),
+        ) + " " + " ".join(rng.sample(_FILLER, 2)))
+        parts.append("")
+    return "\n".join(parts)
+
+
+def questions(kind, count, seed=0):
+    """`count` questions of one kind ("hr", "insurance", "web", "small_talk"), cycling through the pool."""
+    pool = {
+        "hr": [topic[3] for topic in HR_TOPICS],
+        "insurance": INSURANCE_QUESTIONS,
+        "web": WEB_QUESTIONS,
+        "small_talk": SMALL_TALK,
+    }[kind]
+    rng = random.Random(f"{seed}:{kind}")
+    order = list(pool)
+    rng.shuffle(order)
+    return [order[i % len(order)] for i in range(count)]
+
+
+def question_mix(count, seed=0):
+    """`count` (kind, question) pairs drawn from QUESTION_MIX."""
+    rng = random.Random(f"{seed}:mix")
+    kinds = rng.choices(list(QUESTION_MIX), weights=list(QUESTION_MIX.values()), k=count)
+    pools = {kind: iter(questions(kind, count, seed)) for kind in QUESTION_MIX}
+    return [(kind, next(pools[kind])) for kind in kinds]
@@ -0,0 +1,50 @@
+"""Insurance MCP server with the same tools as mcp_server.py, serving the synthetic policy instead of Google Docs.
+
+Started by the MCP client when MCP_SERVER_SCRIPT points here. The client starts it with
+a minimal environment, so its settings are constants rather than environment variables.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp.server.fastmcp import FastMCP
+
+from benchmarks.corpus import insurance_document
+from utils import tracing
+
+# Simulated Google API round-trips; like mcp_server.py, a known revision is trusted for REVISION_TTL seconds.
+DOCS_GET_SECONDS = 0.25
+DRIVE_GET_SECONDS = 0.05
+REVISION_TTL = 300
+REVISION = "1:benchmark"
+
+tracing.set_service_name("mcp-server")
+_content = insurance_document()
+_validated_at = None
+mcp = FastMCP("insurance-server", log_level="WARNING")
+
+
+@mcp.tool()
+def get_document_content(document_id: str) -> str:
+    """Get content from a specific insurance document by ID."""
+    with tracing.span("tool.get_document_content"), tracing.span("gdocs.documents.get"):
+        time.sleep(DOCS_GET_SECONDS)
+        return _content
+
+
+@mcp.tool()
+def get_document_revision(document_id: str) -> str:
+    """Get the current revision identifier of an insurance document (empty if unknown)."""
+    global _validated_at
+    with tracing.span("tool.get_document_revision"):
+        if _validated_at is None or time.time() - _validated_at > REVISION_TTL:
+            with tracing.span("gdocs.drive.files.get"):
+                time.sleep(DRIVE_GET_SECONDS)
+            _validated_at = time.time()
+        return REVISION
+
+
+if __name__ == "__main__":
+    mcp.run()
@@ -0,0 +1,221 @@
+"""Offline stand-ins for Bedrock, the embeddings model and SerpAPI, with configurable latency."""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+# How the fake model picks a tool; mirrors the rules in agent/prompts.py.
+_TOOL_RULES = [
+    ("insurance_query_tool", re.compile(r"\b(insurance|insured|deductible|dental|vision|cashless|hospital)", re.IGNORECASE)),
+    ("websearch_tool", re.compile(r"\b(latest|news|recent|current|industry|trends?)\b", re.IGNORECASE)),
+]
+_SMALL_TALK = re.compile(r"^\s*(hi|hello|thanks|who are you)\b", re.IGNORECASE)
+
+
+def _tokens(text):
+    return (len(text) + 3) // 4
+
+
+def _text(message):
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return " ".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+
+class FakeBedrockChat(BaseChatModel):
+    """Tool-calling chat model that answers like the agent's Bedrock model, without the network.
+
+    Each call waits `latency` seconds (time to first token, with +/- `jitter`) plus
+    output tokens / `tokens_per_second`, and reports token usage estimated at four
+    characters per token, so budgets, cost accounting and streaming behave as in
+    production.
+    """
+
+    model: str = "fake-bedrock"
+    latency: float = 0.4
+    tokens_per_second: float = 80.0
+    jitter: float = 0.2
+    answer_words: int = 60
+
+    @property
+    def _llm_type(self):
+        return "fake-bedrock"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _reply(self, messages, tools):
+        question = next((_text(m) for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        if any(isinstance(m, ToolMessage) for m in messages):
+            observations = " ".join(_text(m) for m in messages if isinstance(m, ToolMessage))
+            return AIMessage(content=self._answer("According to the sources,", observations))
+        if tools:
+            if _SMALL_TALK.match(question):
+                return AIMessage(content="Hello! I'm Annet, your HR policy research assistant. How can I help you today?")
+            names = {tool["function"]["name"]: tool["function"] for tool in tools}
+            name = next((name for name, pattern in _TOOL_RULES if name in names and pattern.search(question)), "rag_tool")
+            if name not in names:
+                name = next(iter(names))
+            argument = (names[name]["parameters"].get("required") or ["query"])[0]
+            return AIMessage(content="", tool_calls=[{"name": name, "args": {argument: question}, "id": f"call_{uuid.uuid4().hex[:12]}"}])
+        # A plain completion (the RAG chain or the insurance tool): answer from the prompt's context.
+        return AIMessage(content=self._answer("Based on the policy,", " ".join(_text(m) for m in messages)))
+
+    def _answer(self, lead, context):
+        words = re.sub(r"\s+", " ", context).split(" ")
+        return " ".join([lead] + words[: self.answer_words])
+
+    def _usage(self, messages, message, tools):
+        input_tokens = sum(_tokens(_text(m)) for m in messages) + _tokens(json.dumps(tools or []))
+        output_tokens = _tokens(_text(message)) + 20 * len(message.tool_calls)
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _delays(self):
+        """(seconds to first token, seconds per output token)."""
+        first = self.latency * random.uniform(1 - self.jitter, 1 + self.jitter)
+        return first, 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _respond(self, messages, tools):
+        message = self._reply(messages, tools)
+        message.usage_metadata = self._usage(messages, message, tools)
+        first, per_token = self._delays()
+        return message, first + per_token * message.usage_metadata["output_tokens"]
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        message, seconds = self._respond(messages, tools)
+        time.sleep(seconds)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        message, seconds = self._respond(messages, tools)
+        await asyncio.sleep(seconds)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        message = self._reply(messages, tools)
+        usage = self._usage(messages, message, tools)
+        first, per_token = self._delays()
+        time.sleep(first)
+        if message.tool_calls:
+            call = message.tool_calls[0]
+            time.sleep(per_token * usage["output_tokens"])
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="", usage_metadata=usage,
+                tool_call_chunks=[{"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": 0}],
+            ))
+            return
+        words = message.content.split(" ")
+        for i, word in enumerate(words):
+            chunk = AIMessageChunk(content=word if i == len(words) - 1 else word + " ")
+            if i == len(words) - 1:
+                chunk.usage_metadata = usage
+            time.sleep(per_token * _tokens(chunk.content))
+            yield ChatGenerationChunk(message=chunk)
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings (hashed unigrams and bigrams); no model download needed."""
+
+    def __init__(self, dimensions=384):
+        self.dimensions = dimensions
+
+    def _embed(self, text):
+        words = re.findall(r"[a-z0-9]+", text.lower())
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for term in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = hashlib.blake2b(term.encode(), digest_size=8).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class LocalSerpAPI:
+    """SerpAPI-compatible search endpoint on localhost, answering after `latency` seconds.
+
+        with LocalSerpAPI(latency=0.3) as serpapi:
+            os.environ["SERPAPI_URL"] = serpapi.url
+    """
+
+    def __init__(self, latency=0.3, results=8):
+        self.latency = latency
+        self.results = results
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/search"
+
+    def _results(self, query):
+        return {
+            "search_metadata": {"status": "Success"},
+            "search_parameters": {"q": query, "engine": "google"},
+            "organic_results": [
+                {
+                    "position": i + 1,
+                    "title": f"{query} - result {i + 1}",
+                    "link": f"https://example.com/{i + 1}/{hashlib.md5(query.encode()).hexdigest()[:8]}",
+                    "snippet": f"Result {i + 1} on {query}: a summary of recent developments, expert commentary and practical guidance for employers.",
+                }
+                for i in range(self.results)
+            ],
+        }
+
+    def start(self):
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+                with owner._lock:
+                    owner.requests += 1
+                time.sleep(owner.latency)
+                body = json.dumps(owner._results(query)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="local-serpapi", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
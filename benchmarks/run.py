@@ -0,0 +1,369 @@
+"""Offline end-to-end benchmark of the agent pipeline.
+
+Builds a synthetic HR corpus in a scratch directory, indexes it, and runs questions
+through `run_agent_with_tools` (or `stream_agent_with_tools`) with Bedrock, SerpAPI
+and the Google Docs MCP server replaced by local stand-ins of configurable latency.
+Everything else (embeddings, Chroma, BM25, router, tools, caches, MCP stdio pool)
+is the real code.
+
+    python -m benchmarks.run                                  # results saved under benchmarks/results/
+    python -m benchmarks.run --embeddings hash --users 1,8    # no model download, two concurrency levels
+    python -m benchmarks.run --compare benchmarks/results/baseline.json   # exit 1 on a regression
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from benchmarks import corpus
+from benchmarks.fakes import FakeBedrockChat, HashEmbeddings, LocalSerpAPI
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+INSURANCE_DOCUMENT_ID = "benchmark-insurance-policy"
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 2**20 if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def latency_summary(samples):
+    """count, mean and p50/p95/p99/max of a list of seconds, in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def at(p):
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 1)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 1),
+        "p50_ms": at(0.5),
+        "p95_ms": at(0.95),
+        "p99_ms": at(0.99),
+        "max_ms": round(ordered[-1] * 1000, 1),
+    }
+
+
+def _configure_environment(workdir, serpapi, args):
+    """Point every external dependency and on-disk state at the scratch directory and stand-ins.
+
+    Must run before the app modules are imported: they read their settings at import time.
+    """
+    os.environ.update({
+        "HR_POLICIES_DIR": os.path.join(workdir, "hr_policies"),
+        "VECTORSTORE_DIR": os.path.join(workdir, "chroma"),
+        "VECTORSTORE_AUTO_SYNC": "false",
+        "EMBEDDING_CACHE_DB": os.path.join(workdir, "embedding_cache.sqlite"),
+        "SERPAPI_URL": serpapi.url,
+        "SERPAPI_KEY": "benchmark",
+        "SERPAPI_RATE_PER_SEC": "1000",
+        "SERPAPI_BURST": "1000",
+        "SERPAPI_MONTHLY_QUOTA": str(10**9),
+        "SERPAPI_QUOTA_FILE": os.path.join(workdir, "serpapi_usage.json"),
+        "SEARCH_CACHE_DB": "",
+        "MCP_SERVER_SCRIPT": os.path.join(ROOT, "benchmarks", "fake_mcp_server.py"),
+        "INSURANCE_DOCUMENT_ID": INSURANCE_DOCUMENT_ID,
+    })
+    if not args.answer_cache:
+        # Cosine similarity never reaches 2, so every question runs the full pipeline.
+        os.environ["ANSWER_CACHE_THRESHOLD"] = "2"
+
+
+def _install_models(args):
+    """Swap the fake LLM (and optionally hash embeddings) into the providers' shared instances."""
+    from providers import bedrock, embeddings
+    from providers.embedding_cache import CachedEmbeddings
+
+    bedrock._LLM = FakeBedrockChat(
+        latency=args.llm_latency_ms / 1000, tokens_per_second=args.llm_tokens_per_second, answer_words=args.answer_words,
+    )
+    if args.embeddings == "hash":
+        embeddings._EMBEDDINGS = CachedEmbeddings(HashEmbeddings(), "hash-384", embeddings.CACHE_DB)
+
+
+def bench_ingestion(args):
+    from providers.vectorstore import DATA_DIR, sync_vector_db
+
+    characters = corpus.write_hr_corpus(DATA_DIR, args.docs, seed=args.seed)
+    started = time.perf_counter()
+    stats = sync_vector_db(full=True)
+    full_seconds = time.perf_counter() - started
+
+    # One edited file: the incremental path re-embeds only its chunks.
+    edited = os.path.join(DATA_DIR, corpus.hr_filename(0))
+    with open(edited, "a") as f:
+        f.write("\n\nAddendum. This section was updated for the benchmark's incremental sync.\n")
+    started = time.perf_counter()
+    incremental = sync_vector_db()
+    incremental_seconds = time.perf_counter() - started
+    return {
+        "documents": args.docs,
+        "characters": characters,
+        "chunks": stats["chunks"],
+        "full_s": round(full_seconds, 3),
+        "chunks_per_second": round(stats["chunks"] / full_seconds, 1) if full_seconds else None,
+        "incremental_s": round(incremental_seconds, 3),
+        "incremental_chunks": incremental.get("ingestion", {}).get("chunks", 0),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def bench_retrieval(args):
+    from providers.vectorstore import get_retriever
+
+    retriever = get_retriever()
+    queries = corpus.questions("hr", args.retrieval_queries, seed=args.seed)
+    retriever.invoke(queries[0])
+    cold, warm = [], []
+    seen = set()
+    for query in queries:
+        started = time.perf_counter()
+        retriever.invoke(query)
+        (warm if query in seen else cold).append(time.perf_counter() - started)
+        seen.add(query)
+    # Repeated questions hit the query-embedding cache; report both.
+    return {"all": latency_summary(cold + warm), "first_seen": latency_summary(cold), "repeated": latency_summary(warm)}
+
+
+def _ask(agent, tools, question, stream):
+    """Run one question; returns (seconds, seconds to first streamed token or None)."""
+    from agent.agent_runner import run_agent_with_tools, stream_agent_with_tools
+
+    started = time.perf_counter()
+    if not stream:
+        run_agent_with_tools(agent, question, tools)
+        return time.perf_counter() - started, None
+    first_token = None
+    for event in stream_agent_with_tools(agent, question, tools):
+        if first_token is None and event["type"] in ("token", "final"):
+            first_token = time.perf_counter() - started
+    return time.perf_counter() - started, first_token
+
+
+def bench_warmup(agent, tools, args):
+    """First question of each kind: MCP server spawn, insurance indexing, model loading."""
+    warmup = {}
+    for kind in corpus.QUESTION_MIX:
+        seconds, _ = _ask(agent, tools, corpus.questions(kind, 1, seed=args.seed)[0], args.stream)
+        warmup[kind] = round(seconds, 3)
+    return warmup
+
+
+def bench_concurrency(agent, tools, users, args):
+    """`users` simulated users, each asking `requests_per_user` questions back to back."""
+    from agent.agent_runner import get_agent_stats
+
+    plans = [corpus.question_mix(args.requests_per_user, seed=f"{args.seed}:{users}:{user}") for user in range(users)]
+    samples, first_tokens, errors = {}, [], []
+    lock = threading.Lock()
+
+    def user_session(plan):
+        for kind, question in plan:
+            try:
+                seconds, first_token = _ask(agent, tools, question, args.stream)
+            except Exception as e:
+                with lock:
+                    errors.append(f"{type(e).__name__}: {e}")
+                continue
+            with lock:
+                samples.setdefault(kind, []).append(seconds)
+                if first_token is not None:
+                    first_tokens.append(first_token)
+
+    before = get_agent_stats()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users, thread_name_prefix="bench-user") as pool:
+        list(pool.map(user_session, plans))
+    wall = time.perf_counter() - started
+    after = get_agent_stats()
+
+    completed = sum(len(values) for values in samples.values())
+    questions = after["questions"] - before["questions"]
+    result = {
+        "users": users,
+        "requests": completed,
+        "errors": len(errors),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(completed / wall, 3) if wall else None,
+        "latency": latency_summary([s for values in samples.values() for s in values]),
+        "by_kind": {kind: latency_summary(values) for kind, values in sorted(samples.items())},
+        "llm_calls_per_request": round((after["llm_calls"] - before["llm_calls"]) / questions, 2) if questions else None,
+        "budget_stops": after["budget_stops"] - before["budget_stops"],
+    }
+    if first_tokens:
+        result["first_token"] = latency_summary(first_tokens)
+    if errors:
+        result["error_samples"] = errors[:5]
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="annet-bench-")
+    serpapi = LocalSerpAPI(latency=args.serpapi_latency_ms / 1000).start()
+    log = sys.stdout if args.verbose else io.StringIO()
+    try:
+        _configure_environment(workdir, serpapi, args)
+        results = {"meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "settings": vars(args),
+        }}
+        with contextlib.redirect_stdout(log):
+            started = time.perf_counter()
+            from agent.agent_runner import get_shared_agent
+            from providers.embeddings import get_embeddings
+
+            _install_models(args)
+            agent, tools = get_shared_agent()
+            get_embeddings().embed_query("warm-up")
+            results["startup_s"] = round(time.perf_counter() - started, 3)
+
+            print("Ingestion...", file=sys.stderr)
+            results["ingestion"] = bench_ingestion(args)
+            print("Retrieval...", file=sys.stderr)
+            results["retrieval"] = bench_retrieval(args)
+            print("Warm-up...", file=sys.stderr)
+            results["warmup_s"] = bench_warmup(agent, tools, args)
+            results["end_to_end"] = {}
+            for users in args.users:
+                print(f"End to end, {users} concurrent user(s)...", file=sys.stderr)
+                results["end_to_end"][f"users_{users}"] = bench_concurrency(agent, tools, users, args)
+
+            from agent.answer_cache import get_answer_cache
+            from agent.router import get_router
+            from utils import tracing
+
+            router = get_router()
+            results["caches"] = {"answer_cache": get_answer_cache().stats(), "serpapi_requests": serpapi.requests}
+            if router is not None:
+                results["router"] = router.stats()
+            results["spans"] = tracing.span_stats()
+        results["memory"] = {"peak_rss_mb": peak_rss_mb()}
+        return results
+    finally:
+        serpapi.stop()
+        if args.keep_workdir:
+            print(f"Scratch directory kept at {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _comparable_metrics(results):
+    """Flat {name: value} of the headline metrics; only throughput is better when larger."""
+    metrics = {
+        "ingestion.full_s": results["ingestion"]["full_s"],
+        "ingestion.incremental_s": results["ingestion"]["incremental_s"],
+        "retrieval.p50_ms": results["retrieval"]["all"].get("p50_ms"),
+        "retrieval.p95_ms": results["retrieval"]["all"].get("p95_ms"),
+        "memory.peak_rss_mb": results["memory"]["peak_rss_mb"],
+    }
+    for level, data in results["end_to_end"].items():
+        metrics[f"{level}.p50_ms"] = data["latency"].get("p50_ms")
+        metrics[f"{level}.p95_ms"] = data["latency"].get("p95_ms")
+        metrics[f"{level}.throughput_rps"] = data["throughput_rps"]
+    return {name: value for name, value in metrics.items() if value is not None}
+
+
+def compare(baseline, results, tolerance):
+    """Print metric changes against a baseline run; return the names of metrics that regressed beyond `tolerance`."""
+    old, new = _comparable_metrics(baseline), _comparable_metrics(results)
+    regressions = []
+    print(f"{'metric':<28} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name in sorted(new):
+        if name not in old or not old[name]:
+            continue
+        change = (new[name] - old[name]) / old[name]
+        worse = -change if name.endswith("throughput_rps") else change
+        flag = ""
+        if worse > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<28} {old[name]:>10} {new[name]:>10} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def print_summary(results):
+    ingestion, retrieval = results["ingestion"], results["retrieval"]["all"]
+    print(f"Ingestion:  {ingestion['documents']} files, {ingestion['chunks']} chunks in {ingestion['full_s']}s "
+          f"({ingestion['chunks_per_second']} chunks/s); one edited file re-synced in {ingestion['incremental_s']}s")
+    print(f"Retrieval:  p50 {retrieval['p50_ms']} ms, p95 {retrieval['p95_ms']} ms over {retrieval['count']} queries")
+    print(f"Warm-up:    {results['warmup_s']}")
+    print(f"{'users':>5} {'requests':>8} {'errors':>6} {'req/s':>7} {'p50 ms':>9} {'p95 ms':>9} {'LLM calls/req':>13}")
+    for data in results["end_to_end"].values():
+        latency = data["latency"]
+        print(f"{data['users']:>5} {data['requests']:>8} {data['errors']:>6} {data['throughput_rps']:>7} "
+              f"{latency.get('p50_ms', '-'):>9} {latency.get('p95_ms', '-'):>9} {data['llm_calls_per_request']!s:>13}")
+        if "first_token" in data:
+            print(f"{'':>5} first streamed token: p50 {data['first_token']['p50_ms']} ms, p95 {data['first_token']['p95_ms']} ms")
+    print(f"Peak RSS:   {results['memory']['peak_rss_mb']} MB")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of ingestion, retrieval and the agent pipeline.")
+    parser.add_argument("--docs", type=int, default=60, help="synthetic HR policy files to index (default: 60)")
+    parser.add_argument("--users", default="1,4,8", help="comma-separated concurrency levels (default: 1,4,8)")
+    parser.add_argument("--requests-per-user", type=int, default=10, help="questions each simulated user asks (default: 10)")
+    parser.add_argument("--retrieval-queries", type=int, default=100, help="retriever calls in the retrieval benchmark (default: 100)")
+    parser.add_argument("--llm-latency-ms", type=float, default=400, help="fake model time to first token (default: 400)")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=80, help="fake model output speed (default: 80)")
+    parser.add_argument("--answer-words", type=int, default=60, help="length of fake model answers (default: 60)")
+    parser.add_argument("--serpapi-latency-ms", type=float, default=300, help="local SerpAPI response time (default: 300)")
+    parser.add_argument("--embeddings", choices=("model", "hash"), default="model",
+                        help="the real sentence-transformers model, or hashed bag-of-words vectors that need no download")
+    parser.add_argument("--stream", action="store_true", help="use stream_agent_with_tools (as the chat UI does) and report time to first token")
+    parser.add_argument("--answer-cache", action="store_true", help="leave the semantic answer cache on (off by default)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="baseline results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative slowdown counted as a regression (default: 0.2)")
+    parser.add_argument("--keep-workdir", action="store_true", help="keep the scratch index and corpus")
+    parser.add_argument("--verbose", action="store_true", help="show the app's own logging")
+    args = parser.parse_args(argv)
+    args.users = [int(users) for users in args.users.split(",") if users.strip()]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print_summary(results)
+    print(f"Results saved to {output}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
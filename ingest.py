@@ -0,0 +1,52 @@
+"""Build or update the persisted HR policy index ahead of time, outside the Streamlit app.
+
+    python ingest.py              # incremental: re-embed only added/changed files, drop deleted ones
+    python ingest.py --full       # drop the index and rebuild it from scratch
+    python ingest.py --dry-run    # report what would change without touching the index
+"""
+import argparse
+import sys
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or update the HR policy vector index.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--full", action="store_true", help="rebuild the index from scratch")
+    mode.add_argument("--dry-run", action="store_true", help="only report what would be (re)indexed")
+    parser.add_argument("--workers", type=int, help="processes used to parse files (default: INGEST_WORKERS)")
+    parser.add_argument("--batch-size", type=int, help="chunks embedded per batch (default: INGEST_BATCH_SIZE)")
+    args = parser.parse_args(argv)
+
+    from providers.vectorstore import DATA_DIR, PERSIST_DIR, sync_vector_db
+
+    print(f"📚 Source documents: {DATA_DIR}")
+    print(f"💾 Index directory:  {PERSIST_DIR}")
+    started = time.perf_counter()
+    stats = sync_vector_db(full=args.full, dry_run=args.dry_run, workers=args.workers, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - started
+
+    print("-" * 50)
+    if args.dry_run:
+        print("🔎 Dry run, nothing was written")
+    if stats["rebuild"]:
+        print("♻️  Full rebuild")
+    for label in ("added", "updated", "removed", "unchanged"):
+        names = stats[label]
+        print(f"{label.capitalize():>10}: {len(names)}" + (f" ({', '.join(names)})" if names and label != "unchanged" else ""))
+    if args.dry_run:
+        print(f"    Chunks: {stats['chunks_to_index']} to embed")
+    else:
+        ingestion = stats.get("ingestion", {})
+        print(f"    Chunks: {ingestion.get('chunks', 0)} embedded, {stats['chunks']} in index")
+        if ingestion:
+            print(f"Throughput: {ingestion['chunks_per_second']} chunks/s")
+    print(f"   Seconds: {elapsed:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,28 @@
 import streamlit as st
-from agent.agent_runner import get_agent, run_agent_with_tools
-from providers.bedrock import get_llm
-from providers.vectorstore import reset_vector_db
-from providers.websearch import clear_search_cache
 from dotenv import load_dotenv
-load_dotenv()
+load_dotenv()  # before the app imports, which read their settings at import time
+
+from utils.startup import rss_mb, startup_report, timed
+
+with timed("imports"):
+    from agent.agent_runner import TOOL_DISPLAY_NAMES, get_shared_agent, stream_agent_with_tools
+    from agent.llm_usage import format_usage
+    from providers.vectorstore import get_retriever
+    from providers.websearch import clear_search_cache
+
+
+# Built once per server process and reused by every rerun and session.
+@st.cache_resource(show_spinner="Opening the HR policy index...")
+def load_retriever():
+    with timed("policy index"):
+        return get_retriever()
+
+
+@st.cache_resource(show_spinner="Starting Annet...")
+def load_agent():
+    with timed("agent"):
+        return get_shared_agent()
+
 
 # --- Streamlit UI ---
 st.set_page_config(page_title="Annet - HR Policy Research Assistant")
@@ -50,13 +68,15 @@ with st.sidebar:
 # --- Chat UI ---
 if "messages" not in st.session_state:
     st.session_state.messages = []
-if "db_reset" not in st.session_state:
-    st.session_state.db_reset = True
-    reset_vector_db()
+    st.session_state.rss_at_start = rss_mb()
+# Opens the index built by `python ingest.py` (built here only if it doesn't exist yet).
+load_retriever()
 
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
+        if message.get("footer"):
+            st.caption(message["footer"])
 
 if prompt := st.chat_input("Ask me anything about HR policies..."):
     st.session_state.messages.append({"role": "user", "content": prompt})
@@ -65,11 +85,43 @@ if prompt := st.chat_input("Ask me anything about HR policies..."):
 
 if "pending_prompt" in st.session_state:
     prompt = st.session_state.pending_prompt
-    agent, tools = get_agent(get_llm())
+    agent, tools = load_agent()
     with st.chat_message("assistant"):
-        with st.spinner("Annet is thinking..."):
-            answer = run_agent_with_tools(agent, prompt, tools)
-            if answer:
-                st.markdown(answer)
-                st.session_state.messages.append({"role": "assistant", "content": answer})
+        status = st.empty()
+        placeholder = st.empty()
+        status.markdown("_Annet is thinking..._")
+        streamed = ""
+        answer = None
+        footer = None
+        for event in stream_agent_with_tools(agent, prompt, tools):
+            if event["type"] == "tool_start":
+                # Anything streamed before a tool call was the model thinking aloud, not the answer.
+                streamed = ""
+                placeholder.empty()
+                status.markdown(f"_Using {TOOL_DISPLAY_NAMES.get(event['tool'], event['tool'])}..._")
+            elif event["type"] == "discard":
+                streamed = ""
+                placeholder.empty()
+            elif event["type"] == "token":
+                streamed += event["text"]
+                placeholder.markdown(streamed + "▌")
+            elif event["type"] == "final":
+                answer = event["text"]
+                footer = format_usage(event["usage"])
+        status.empty()
+        if answer:
+            placeholder.markdown(answer)
+            st.caption(footer)
+            st.session_state.messages.append({"role": "assistant", "content": answer, "footer": footer})
     del st.session_state.pending_prompt
+
+# Rendered last so it includes everything loaded during this run.
+with st.sidebar:
+    timings = startup_report()
+    if timings:
+        with st.expander("⏱️ Startup time & memory"):
+            for phase, seconds in timings.items():
+                st.caption(f"{phase}: {seconds:.2f}s")
+            # Agent, retriever and embedding model are shared, so a new session should barely move this.
+            rss = rss_mb()
+            st.caption(f"process memory: {rss:.0f} MB (+{rss - st.session_state.rss_at_start:.0f} MB since this session started)")
@@ -1,26 +1,96 @@
 import os
 import json
 import sys
+import time
+import hashlib
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Optional
 from dotenv import load_dotenv
 
 from mcp.server.fastmcp import FastMCP
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-
-print("[MCP SERVER] Starting simplified MCP Insurance Server...", flush=True)
+# stdout carries the MCP protocol; all logging goes to stderr.
+print("[MCP SERVER] Starting simplified MCP Insurance Server...", file=sys.stderr, flush=True)
 
 load_dotenv()
 
+from utils import tracing  # reads TRACE_* at import, so after load_dotenv()
+
+tracing.set_service_name("mcp-server")
+
 SCOPES = [
     "https://www.googleapis.com/auth/documents.readonly",
     "https://www.googleapis.com/auth/drive.readonly",
 ]
 
+class DocumentCache:
+    """LRU cache of extracted document text, tagged with the Drive revision it came from.
+
+    Entries younger than `ttl` seconds are served without touching the Google APIs;
+    older entries are revalidated against the file's Drive revision before reuse.
+    When `cache_dir` is set, entries are also written to disk so they survive restarts.
+    """
+
+    def __init__(self, max_entries: int = 32, ttl: float = 300, cache_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, document_id: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(document_id.encode()).hexdigest() + ".json")
+
+    def get(self, document_id: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(document_id)
+            if entry is not None:
+                self._entries.move_to_end(document_id)
+                return entry
+        if not self.cache_dir or not os.path.exists(self._path(document_id)):
+            return None
+        try:
+            with open(self._path(document_id)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._store(document_id, entry)
+        return entry
+
+    def is_fresh(self, entry: Dict) -> bool:
+        return time.time() - entry["validated_at"] < self.ttl
+
+    def put(self, document_id: str, content: str, revision: Optional[str]):
+        entry = {"content": content, "revision": revision, "validated_at": time.time()}
+        self._store(document_id, entry)
+        self._write(document_id, entry)
+
+    def mark_validated(self, document_id: str, entry: Dict):
+        entry["validated_at"] = time.time()
+        self._write(document_id, entry)
+
+    def _store(self, document_id: str, entry: Dict):
+        with self._lock:
+            self._entries[document_id] = entry
+            self._entries.move_to_end(document_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _write(self, document_id: str, entry: Dict):
+        if not self.cache_dir:
+            return
+        tmp_path = self._path(document_id) + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._path(document_id))
+        except OSError as e:
+            print(f"[MCP SERVER] Could not persist cache entry: {e}", file=sys.stderr, flush=True)
+
+
 class GoogleDocsService:
     def __init__(self):
         self.creds = None
@@ -28,10 +98,26 @@ class GoogleDocsService:
         self.drive_service = None
         self.insurance_folder_id = os.getenv("INSURANCE_FOLDER_ID")
         self._authenticated = False
+        self.cache = DocumentCache(
+            max_entries=int(os.getenv("DOC_CACHE_MAX_ENTRIES", "32")),
+            ttl=float(os.getenv("DOC_CACHE_TTL", "300")),
+            cache_dir=os.getenv("DOC_CACHE_DIR") or None,
+        )
 
     def authenticate(self):
         if self._authenticated:
             return
+        with tracing.span("gdocs.authenticate"):
+            self._authenticate()
+
+    def _authenticate(self):
+        # The Google client libraries are slow to import; load them on first use so the
+        # server answers the MCP handshake (and cached requests) without them.
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        from googleapiclient.discovery import build
+
         creds_file = os.getenv("GOOGLE_CREDENTIALS_FILE", "credentials.json")
         token_file = os.getenv("GOOGLE_TOKEN_FILE", "token.json")
         if os.path.exists(token_file):
@@ -48,23 +134,53 @@ class GoogleDocsService:
         self.drive_service = build("drive", "v3", credentials=self.creds)
         self._authenticated = True
 
+    def get_document_revision(self, document_id: str) -> Optional[str]:
+        """Cheap Drive metadata lookup identifying the current revision of a file."""
+        from googleapiclient.errors import HttpError
+
+        try:
+            with tracing.span("gdocs.drive.files.get"):
+                meta = self.drive_service.files().get(fileId=document_id, fields="version,modifiedTime").execute()
+        except HttpError as e:
+            print(f"[MCP SERVER] Could not read revision for {document_id}: {e}", file=sys.stderr, flush=True)
+            return None
+        return f"{meta.get('version')}:{meta.get('modifiedTime')}"
+
+    def current_revision(self, document_id: str) -> Optional[str]:
+        """Revision of a document, answered from the cache while the entry is fresh."""
+        cached = self.cache.get(document_id)
+        if cached is not None and self.cache.is_fresh(cached):
+            return cached["revision"]
+        self.authenticate()
+        return self.get_document_revision(document_id)
+
     def get_document_content(self, document_id: str) -> str:
         """Get content from a specific Google Doc."""
-        print(f"[MCP SERVER] get_document_content called with ID: {document_id}", flush=True)
+        print(f"[MCP SERVER] get_document_content called with ID: {document_id}", file=sys.stderr, flush=True)
 
         try:
+            cached = self.cache.get(document_id) if document_id else None
+            if cached is not None and self.cache.is_fresh(cached):
+                return cached["content"]
+
             self.authenticate()
 
             if not self.docs_service:
-                print("[MCP SERVER] Docs service not available", flush=True)
+                print("[MCP SERVER] Docs service not available", file=sys.stderr, flush=True)
                 return "Error: Google Docs service not available"
 
             if not document_id:
-                print("[MCP SERVER] No document ID provided", flush=True)
+                print("[MCP SERVER] No document ID provided", file=sys.stderr, flush=True)
                 return "Error: No document ID provided"
 
-            print(f"[MCP SERVER] Fetching document {document_id}...", flush=True)
-            document = self.docs_service.documents().get(documentId=document_id).execute()
+            revision = self.get_document_revision(document_id)
+            if cached is not None and revision is not None and cached["revision"] == revision:
+                self.cache.mark_validated(document_id, cached)
+                return cached["content"]
+
+            print(f"[MCP SERVER] Fetching document {document_id}...", file=sys.stderr, flush=True)
+            with tracing.span("gdocs.documents.get"):
+                document = self.docs_service.documents().get(documentId=document_id).execute()
 
             content = []
             for element in document.get("body", {}).get("content", []):
@@ -74,7 +190,8 @@ class GoogleDocsService:
                             content.append(para_element["textRun"]["content"])
 
             result = "".join(content)
-            print(f"[MCP SERVER] Retrieved document content ({len(result)} chars)", flush=True)
+            print(f"[MCP SERVER] Retrieved document content ({len(result)} chars)", file=sys.stderr, flush=True)
+            self.cache.put(document_id, result, revision)
             return result
 
         except Exception as e:
@@ -87,27 +204,41 @@ gdocs = GoogleDocsService()
 
 mcp = FastMCP("insurance-server")
 
-print("[MCP SERVER] Registering single tool...", flush=True)
+print("[MCP SERVER] Registering tools...", file=sys.stderr, flush=True)
 
 @mcp.tool()
 def get_document_content(document_id: str) -> str:
     """Get content from a specific insurance document by ID."""
-    return gdocs.get_document_content(document_id)
+    with tracing.span("tool.get_document_content") as span:
+        content = gdocs.get_document_content(document_id)
+        span.set(chars=len(content))
+        return content
 
-print("[MCP SERVER] get_document_content tool registered", flush=True)
+print("[MCP SERVER] get_document_content tool registered", file=sys.stderr, flush=True)
+
+@mcp.tool()
+def get_document_revision(document_id: str) -> str:
+    """Get the current revision identifier of an insurance document (empty if unknown)."""
+    try:
+        with tracing.span("tool.get_document_revision"):
+            return gdocs.current_revision(document_id) or ""
+    except Exception as e:
+        print(f"[MCP SERVER] Exception in get_document_revision: {e}", file=sys.stderr, flush=True)
+        return ""
 
 if __name__ == "__main__":
-    print("[MCP SERVER] Starting simplified server...", flush=True)
-    print("📋 Available tool:")
-    print("   - get_document_content: Get document content by ID")
-    print("🔗 Server ready to accept connections...")
-    print("💡 Note: Google OAuth credentials required for full functionality")
-    print("-" * 50)
+    print("[MCP SERVER] Starting simplified server...", file=sys.stderr, flush=True)
+    print("📋 Available tool:", file=sys.stderr)
+    print("   - get_document_content: Get document content by ID", file=sys.stderr)
+    print("   - get_document_revision: Get a document's current revision ID", file=sys.stderr)
+    print("🔗 Server ready to accept connections...", file=sys.stderr)
+    print("💡 Note: Google OAuth credentials required for full functionality", file=sys.stderr)
+    print("-" * 50, file=sys.stderr)
 
     try:
         mcp.run()
     except KeyboardInterrupt:
-        print("\n🛑 Server stopped by user")
+        print("\n🛑 Server stopped by user", file=sys.stderr)
     except Exception as e:
-        print(f"❌ Server error: {e}")
+        print(f"❌ Server error: {e}", file=sys.stderr)
         sys.exit(1)
\ No newline at end of file
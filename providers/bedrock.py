@@ -1,4 +1,16 @@
-from langchain_aws import ChatBedrockConverse
+import threading
+
+_LLM = None
+_lock = threading.Lock()
+
 
 def get_llm():
-    return ChatBedrockConverse(model="anthropic.claude-3-sonnet-20240229-v1:0")
\ No newline at end of file
+    """Return the process-wide Bedrock chat model (its boto3 client is thread-safe)."""
+    global _LLM
+    if _LLM is None:
+        with _lock:
+            if _LLM is None:
+                from langchain_aws import ChatBedrockConverse
+
+                _LLM = ChatBedrockConverse(model="anthropic.claude-3-sonnet-20240229-v1:0")
+    return _LLM
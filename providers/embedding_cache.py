@@ -0,0 +1,99 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from utils import tracing
+
+_SQL_BATCH = 500
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embeddings model with an on-disk cache of float32 vectors keyed by text hash.
+
+    Document and query vectors are cached separately (some models embed them
+    differently). Query vectors also go through a small in-memory LRU, so repeated
+    questions skip both the model and the database.
+    """
+
+    def __init__(self, base: Embeddings, model_name: str, db_path: str, memory_entries: int = 1024):
+        self.base = base
+        self.model_name = model_name
+        self.memory_entries = memory_entries
+        self._queries = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, kind: str, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{kind}\0{text}".encode()).hexdigest()
+
+    def _fetch(self, keys: List[str]):
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start:start + _SQL_BATCH]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                found.update((key, np.frombuffer(blob, dtype=np.float32)) for key, blob in rows)
+        return found
+
+    def _save(self, items):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items],
+            )
+            self._db.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with tracing.span("embedding.documents", texts=len(texts)) as span:
+            keys = [self._key("doc", text) for text in texts]
+            vectors = self._fetch(list(dict.fromkeys(keys)))
+            missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+            self.hits += len(texts) - sum(1 for key in keys if key in missing)
+            self.misses += len(missing)
+            span.set(computed=len(missing))
+            if missing:
+                with tracing.span("embedding.model", texts=len(missing)):
+                    computed = self.base.embed_documents(list(missing.values()))
+                new = list(zip(missing.keys(), computed))
+                self._save(new)
+                vectors.update((key, np.asarray(vector, dtype=np.float32)) for key, vector in new)
+            return [vectors[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        with self._lock:
+            vector = self._queries.get(key)
+            if vector is not None:
+                self._queries.move_to_end(key)
+        if vector is None:
+            vector = self._fetch([key]).get(key)
+        if vector is None:
+            self.misses += 1
+            with tracing.span("embedding.model", texts=1):
+                vector = np.asarray(self.base.embed_query(text), dtype=np.float32)
+            self._save([(key, vector)])
+        else:
+            self.hits += 1
+        with self._lock:
+            self._queries[key] = vector
+            self._queries.move_to_end(key)
+            while len(self._queries) > self.memory_entries:
+                self._queries.popitem(last=False)
+        return vector.tolist()
+
+    def stats(self):
+        with self._lock:
+            stored = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "stored_vectors": stored}
@@ -1,4 +1,23 @@
-from langchain.embeddings import SentenceTransformerEmbeddings
+from providers.embedding_cache import CachedEmbeddings
+import os
+import threading
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+CACHE_DB = os.getenv("EMBEDDING_CACHE_DB", os.path.join(os.path.dirname(__file__), "..", "data", "embedding_cache.sqlite"))
+
+_EMBEDDINGS = None
+_lock = threading.Lock()
+
 
 def get_embeddings():
-    return SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
\ No newline at end of file
+    """Return the shared embeddings model, wrapped in the on-disk vector cache unless EMBEDDING_CACHE_DB is empty."""
+    global _EMBEDDINGS
+    if _EMBEDDINGS is None:
+        with _lock:
+            if _EMBEDDINGS is None:
+                # Loads sentence-transformers/torch, so it stays out of module import time.
+                from langchain.embeddings import SentenceTransformerEmbeddings
+
+                model = SentenceTransformerEmbeddings(model_name=MODEL_NAME)
+                _EMBEDDINGS = CachedEmbeddings(model, MODEL_NAME, CACHE_DB) if CACHE_DB else model
+    return _EMBEDDINGS
@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of making a request while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and fails fast for `reset_timeout` seconds.
+
+    After the timeout a single trial request is let through (half-open); its outcome
+    closes the circuit again or re-opens it for another timeout.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class LatencyTracker:
+    """Rolling window of call latencies with percentile summaries."""
+
+    def __init__(self, window: int = 500):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def record(self, seconds: float, ok: bool):
+        with self._lock:
+            self._samples.append(seconds)
+            self.calls += 1
+            if not ok:
+                self.errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = sorted(self._samples)
+            calls, errors = self.calls, self.errors
+        if not samples:
+            return {"calls": calls, "errors": errors}
+
+        def pct(p):
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 1)
+
+        return {"calls": calls, "errors": errors, "p50_ms": pct(0.5), "p95_ms": pct(0.95), "max_ms": round(samples[-1] * 1000, 1)}
+
+
+class PooledHttpClient:
+    """Keep-alive `requests` session with bounded, jittered retries, a circuit breaker and latency metrics."""
+
+    def __init__(
+        self,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 10,
+        retries: int = 2,
+        backoff_factor: float = 0.5,
+        pool_size: int = 10,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyTracker()
+        retry = Retry(
+            total=retries,
+            # A stalled read already cost a full read timeout; retrying it would multiply the user's wait.
+            read=0,
+            backoff_factor=backoff_factor,
+            backoff_jitter=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET"]),
+            # A long Retry-After would park the caller; keep the worst case bounded instead.
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {url}")
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = self.session.get(url, timeout=self.timeout, **kwargs)
+            if response.status_code in RETRY_STATUSES:
+                self.breaker.record_failure()
+            else:
+                # Other 4xx responses are request/config problems, not an unhealthy endpoint.
+                self.breaker.record_success()
+                ok = response.ok
+            return response
+        except requests.exceptions.RequestException:
+            self.breaker.record_failure()
+            raise
+        finally:
+            self.latency.record(time.perf_counter() - started, ok)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.latency.stats(), "circuit": self.breaker.state}
@@ -0,0 +1,129 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+import os
+import time
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+WORKERS = int(os.getenv("INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+def load_file(path):
+    from langchain.document_loaders import PyPDFLoader, TextLoader
+
+    if path.endswith(".pdf"):
+        return PyPDFLoader(path).load()
+    return TextLoader(path).load()
+
+
+def get_splitter():
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    # start_index lets the RAG context packer merge overlapping chunks of the same page.
+    return RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, add_start_index=True)
+
+
+def _parse_file(fname, path, file_hash):
+    """Load and split one file. Runs in a worker process, so it only returns plain data."""
+    chunks = get_splitter().split_documents(load_file(path))
+    ids = [f"{fname}:{file_hash[:16]}:{i}" for i in range(len(chunks))]
+    metadatas = [{**chunk.metadata, "file_hash": file_hash} for chunk in chunks]
+    return fname, ids, [chunk.page_content for chunk in chunks], metadatas
+
+
+def _parsed_files(files, workers):
+    """Yield parsed files as soon as each one is ready."""
+    if workers <= 1 or len(files) <= 1:
+        for fname, (path, file_hash) in files.items():
+            yield _parse_file(fname, path, file_hash)
+        return
+    # spawn, not fork: the parent may already hold torch/chromadb threads.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(_parse_file, fname, path, file_hash) for fname, (path, file_hash) in files.items()]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def count_chunks(files, workers=None):
+    """Number of chunks the files would produce, without embedding anything."""
+    return sum(len(ids) for _, ids, _, _ in _parsed_files(files, workers or WORKERS))
+
+
+class IngestionReport:
+    def __init__(self, total_files):
+        self.total_files = total_files
+        self.files = 0
+        self.chunks = 0
+        self.parse_seconds = 0.0
+        self.embed_seconds = 0.0
+        self.write_seconds = 0.0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def summary(self):
+        elapsed = self.elapsed
+        return {
+            "files": self.files,
+            "chunks": self.chunks,
+            "seconds": round(elapsed, 2),
+            "parse_seconds": round(self.parse_seconds, 2),
+            "embed_seconds": round(self.embed_seconds, 2),
+            "write_seconds": round(self.write_seconds, 2),
+            "chunks_per_second": round(self.chunks / elapsed, 1) if elapsed else 0.0,
+        }
+
+    def __str__(self):
+        s = self.summary()
+        return (
+            f"{s['files']}/{self.total_files} files, {s['chunks']} chunks in {s['seconds']}s "
+            f"({s['chunks_per_second']} chunks/s; parse {s['parse_seconds']}s, embed {s['embed_seconds']}s, write {s['write_seconds']}s)"
+        )
+
+
+def ingest_files(vectorstore, embeddings, files, batch_size=None, workers=None, on_batch=None):
+    """Parse files in a process pool and stream their chunks through batched embedding into the store.
+
+    `files` maps file name to (path, content hash). `on_batch(ids, texts)` is called
+    after each batch is written, so side indexes can follow along. Returns
+    ({file name: chunk ids}, report).
+    """
+    batch_size = batch_size or BATCH_SIZE
+    report = IngestionReport(len(files))
+    ids_by_file = {}
+    pending = {"ids": [], "documents": [], "metadatas": []}
+
+    def flush(limit=None):
+        batch = {key: values[:limit] for key, values in pending.items()}
+        for values in pending.values():
+            del values[:limit]
+        if not batch["ids"]:
+            return
+        started = time.perf_counter()
+        vectors = embeddings.embed_documents(batch["documents"])
+        report.embed_seconds += time.perf_counter() - started
+        started = time.perf_counter()
+        vectorstore._collection.upsert(embeddings=vectors, **batch)
+        report.write_seconds += time.perf_counter() - started
+        if on_batch is not None:
+            on_batch(batch["ids"], batch["documents"])
+        report.chunks += len(batch["ids"])
+        print(f"[Ingest] {report}")
+
+    waited = time.perf_counter()
+    for fname, ids, texts, metadatas in _parsed_files(files, workers or WORKERS):
+        report.parse_seconds += time.perf_counter() - waited
+        report.files += 1
+        ids_by_file[fname] = ids
+        pending["ids"].extend(ids)
+        pending["documents"].extend(texts)
+        pending["metadatas"].extend(metadatas)
+        while len(pending["ids"]) >= batch_size:
+            flush(batch_size)
+        waited = time.perf_counter()
+    flush()
+    return ids_by_file, report
@@ -0,0 +1,101 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+# Acronyms and form numbers ("LTA", "Form 16") carry the meaning in HR questions, so
+# tokens are kept as-is apart from case; only very common function words are dropped.
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it my of on or the to what when where which who will with you your".split()
+)
+
+
+def tokenize(text):
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in _STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over chunk ids, maintained incrementally and persisted as JSON.
+
+    Only per-chunk term frequencies are stored on disk; postings lists and document
+    frequencies are rebuilt in memory on load.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._term_freqs = {}
+        self._lengths = {}
+        self._postings = defaultdict(dict)
+        self._total_length = 0
+        self._lock = threading.RLock()
+        self.version = None
+
+    def __len__(self):
+        return len(self._term_freqs)
+
+    def add(self, chunk_id, text):
+        with self._lock:
+            if chunk_id in self._term_freqs:
+                self.remove(chunk_id)
+            self._index(chunk_id, dict(Counter(tokenize(text))))
+
+    def _index(self, chunk_id, term_freqs):
+        self._term_freqs[chunk_id] = term_freqs
+        length = sum(term_freqs.values())
+        self._lengths[chunk_id] = length
+        self._total_length += length
+        for term, freq in term_freqs.items():
+            self._postings[term][chunk_id] = freq
+
+    def remove(self, chunk_id):
+        with self._lock:
+            term_freqs = self._term_freqs.pop(chunk_id, None)
+            if term_freqs is None:
+                return
+            self._total_length -= self._lengths.pop(chunk_id)
+            for term in term_freqs:
+                postings = self._postings[term]
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def search(self, query, k=10):
+        """Return up to k (chunk_id, score) pairs, best first."""
+        with self._lock:
+            n_docs = len(self._term_freqs)
+            if not n_docs:
+                return []
+            avg_length = self._total_length / n_docs
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, freq in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[chunk_id] / avg_length)
+                    scores[chunk_id] += idf * freq * (self.k1 + 1) / (freq + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def save(self, path):
+        with self._lock:
+            data = {"version": self.version, "k1": self.k1, "b": self.b, "term_freqs": self._term_freqs}
+            # Unique per writer: the app (rebuilding a stale index) and ingest.py may save at the same time.
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        index = cls(k1=data.get("k1", 1.5), b=data.get("b", 0.75))
+        index.version = data.get("version")
+        for chunk_id, term_freqs in data["term_freqs"].items():
+            index._index(chunk_id, term_freqs)
+        return index
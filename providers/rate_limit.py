@@ -0,0 +1,134 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `burst`.
+
+    Callers never wait: a saturated bucket turns into an immediate "rate limited"
+    answer (and the search fallback) instead of a blocked UI thread.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        """Take a token without waiting; False (counted as rejected) if the bucket is empty."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            self.rejected += 1
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refill()
+            return {"rate_per_sec": self.rate, "burst": self.burst, "available": round(self._tokens, 2), "rejected": self.rejected}
+
+
+class RequestCoalescer:
+    """Lets concurrent callers asking for the same key share a single in-flight call."""
+
+    def __init__(self):
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def run(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+class MonthlyQuota:
+    """Counts calls against a calendar-month allowance, persisted to a small JSON file."""
+
+    def __init__(self, limit: int, state_file: Optional[str] = None):
+        self.limit = limit
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        self._month = self._current_month()
+        self._used = 0
+        self._load()
+
+    @staticmethod
+    def _current_month() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m")
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        if state.get("month") == self._month:
+            self._used = int(state.get("used", 0))
+
+    def _save(self):
+        if not self.state_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.state_file)), exist_ok=True)
+            with open(self.state_file, "w") as f:
+                json.dump({"month": self._month, "used": self._used}, f)
+        except OSError as e:
+            print(f"Could not save search quota state: {e}")
+
+    def _roll_over(self):
+        month = self._current_month()
+        if month != self._month:
+            self._month = month
+            self._used = 0
+
+    def exhausted(self) -> bool:
+        with self._lock:
+            self._roll_over()
+            return self._used >= self.limit
+
+    def consume(self):
+        """Count one call; done once the call has actually been served, so failed requests are free."""
+        with self._lock:
+            self._roll_over()
+            self._used += 1
+            self._save()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._roll_over()
+            return {"month": self._month, "used": self._used, "limit": self.limit, "remaining": max(self.limit - self._used, 0)}
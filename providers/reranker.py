@@ -0,0 +1,104 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from collections import OrderedDict
+from providers.http_client import LatencyTracker
+import hashlib
+import os
+import threading
+import time
+
+ENABLED = os.getenv("RERANK_ENABLED", "false").lower() in ("1", "true", "yes")
+MODEL_NAME = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))
+BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("RERANK_CACHE_MAX_ENTRIES", "10000"))
+
+_RERANKER = None
+_lock = threading.Lock()
+
+
+class CrossEncoderReranker:
+    """Reorders retrieved chunks with a local cross-encoder.
+
+    All uncached (query, chunk) pairs of a request are scored in one batched forward
+    pass on a dedicated thread. If that takes longer than the latency budget the
+    caller gets the original order back; the pass still finishes and its scores are
+    cached for the next time the question comes up.
+    """
+
+    def __init__(self, model, candidates=CANDIDATES, budget_ms=BUDGET_MS, cache_max_entries=CACHE_MAX_ENTRIES):
+        self.model = model
+        self.candidates = candidates
+        self.budget = budget_ms / 1000
+        self.cache_max_entries = cache_max_entries
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self.latency = LatencyTracker()
+        self.cache_hits = 0
+        self.fallbacks = 0
+
+    @staticmethod
+    def _key(query, doc):
+        return hashlib.sha256(f"{query}\0{doc.id or doc.page_content}".encode()).hexdigest()
+
+    def _cached(self, keys):
+        with self._lock:
+            found = {key: self._scores[key] for key in keys if key in self._scores}
+            for key in found:
+                self._scores.move_to_end(key)
+            self.cache_hits += len(found)
+        return found
+
+    def _score(self, keys, pairs):
+        scores = self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+        result = dict(zip(keys, (float(score) for score in scores)))
+        with self._lock:
+            self._scores.update(result)
+            while len(self._scores) > self.cache_max_entries:
+                self._scores.popitem(last=False)
+        return result
+
+    def rerank(self, query, docs, k):
+        """Return the k best docs by cross-encoder score, or the first k if the budget runs out."""
+        started = time.perf_counter()
+        keys = [self._key(query, doc) for doc in docs]
+        scores = self._cached(keys)
+        missing = [(key, doc) for key, doc in zip(keys, docs) if key not in scores]
+        ok = True
+        if missing:
+            future = self._executor.submit(self._score, [key for key, _ in missing], [(query, doc.page_content) for _, doc in missing])
+            try:
+                scores.update(future.result(timeout=max(self.budget - (time.perf_counter() - started), 0)))
+            except TimeoutError:
+                ok = False
+            except Exception as e:
+                print(f"[Rerank] Scoring failed: {e}")
+                ok = False
+        self.latency.record(time.perf_counter() - started, ok)
+        if not ok:
+            self.fallbacks += 1
+            print(f"[Rerank] Over the {self.budget * 1000:.0f} ms budget; keeping retrieval order")
+            return docs[:k]
+        ranked = sorted(zip(keys, docs), key=lambda item: scores[item[0]], reverse=True)[:k]
+        for key, doc in ranked:
+            doc.metadata["rerank_score"] = round(scores[key], 4)
+        return [doc for _, doc in ranked]
+
+    def stats(self):
+        with self._lock:
+            cached = len(self._scores)
+        return {**self.latency.stats(), "fallbacks": self.fallbacks, "cache_hits": self.cache_hits, "cached_scores": cached}
+
+
+def get_reranker():
+    """Return the shared reranker, or None unless RERANK_ENABLED is set."""
+    global _RERANKER
+    if not ENABLED:
+        return None
+    if _RERANKER is None:
+        with _lock:
+            if _RERANKER is None:
+                from sentence_transformers import CrossEncoder
+
+                _RERANKER = CrossEncoderReranker(CrossEncoder(MODEL_NAME, max_length=512))
+    return _RERANKER
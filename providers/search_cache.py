@@ -0,0 +1,108 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Queries mentioning any of these are about moving targets and expire quickly.
+FRESHNESS_TERMS = ("latest", "news", "today", "recent", "current", "this week", "breaking")
+
+
+def normalize_query(query: str) -> str:
+    """Canonical cache key: case-folded, whitespace-collapsed, trailing punctuation removed."""
+    key = re.sub(r"\s+", " ", query.casefold()).strip()
+    return key.rstrip("?!.").strip()
+
+
+class SearchCache:
+    """Thread-safe LRU cache for web search results with per-entry TTLs.
+
+    When `db_path` is given, entries are written through to SQLite and read back on
+    a memory miss, so results survive app restarts.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 86400, fresh_ttl: float = 900, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.fresh_ttl = fresh_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+        self._db = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache (key TEXT PRIMARY KEY, result TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM search_cache WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+
+    def ttl_for(self, key: str) -> float:
+        return self.fresh_ttl if any(term in key for term in FRESHNESS_TERMS) else self.ttl
+
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute("SELECT result, expires_at FROM search_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = (json.loads(row[0]), row[1])
+                    self._store(key, entry)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            result, expires_at = entry
+            if expires_at < now:
+                self._entries.pop(key, None)
+                if self._db is not None:
+                    self._db.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                    self._db.commit()
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return result
+
+    def put(self, query: str, result: Dict[str, Any]):
+        key = normalize_query(query)
+        expires_at = time.time() + self.ttl_for(key)
+        with self._lock:
+            self._store(key, (result, expires_at))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO search_cache (key, result, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(result), expires_at),
+                )
+                self._db.commit()
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evicted"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM search_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                "persistent": self._db is not None,
+            }
@@ -1,43 +1,356 @@
-from langchain.vectorstores import Chroma
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.document_loaders import PyPDFLoader, TextLoader
 from providers.embeddings import get_embeddings
+from providers.ingestion import CHUNK_OVERLAP, CHUNK_SIZE, count_chunks, ingest_files, load_file
+from providers.lexical_index import BM25Index
+from providers.reranker import get_reranker
+from utils import tracing
+from typing import Any, Dict, List
+import hashlib
+import json
 import os
+import threading
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
 
 VECTORSTORE = None
 RETRIEVER = None
 CHUNKS = None
+LEXICAL_INDEX = None
+# Manifest the open index was loaded from, to notice syncs made by another process (ingest.py).
+_OPENED_MANIFEST = {"mtime": None, "version": None}
+
+DATA_DIR = os.getenv("HR_POLICIES_DIR", os.path.join(os.path.dirname(__file__), "..", "data", "hr_policies"))
+PERSIST_DIR = os.getenv("VECTORSTORE_DIR", os.path.join(os.path.dirname(__file__), "..", "data", "chroma"))
+MANIFEST_FILE = os.path.join(PERSIST_DIR, "manifest.json")
+LEXICAL_INDEX_FILE = os.path.join(PERSIST_DIR, "bm25.json")
+COLLECTION_NAME = "hr_policies"
+AUTO_SYNC = os.getenv("VECTORSTORE_AUTO_SYNC", "false").lower() in ("1", "true", "yes")
+RETRIEVER_MODE = os.getenv("RETRIEVER_MODE", "hybrid").lower()
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", "4"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = 60
+
+_lock = threading.RLock()
+
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "hr_policies")
+def _list_source_files():
+    files = {}
+    if not os.path.isdir(DATA_DIR):
+        return files
+    for fname in sorted(os.listdir(DATA_DIR)):
+        if fname.endswith(".pdf") or fname.endswith(".txt"):
+            files[fname] = os.path.join(DATA_DIR, fname)
+    return files
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
 
 def load_documents():
     docs = []
-    for fname in os.listdir(DATA_DIR):
-        path = os.path.join(DATA_DIR, fname)
-        if fname.endswith(".pdf"):
-            docs.extend(PyPDFLoader(path).load())
-        elif fname.endswith(".txt"):
-            docs.extend(TextLoader(path).load())
+    for path in _list_source_files().values():
+        docs.extend(load_file(path))
     return docs
 
+
+def _splitter_config():
+    return {"chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP, "add_start_index": True}
+
+
+def _manifest_mtime():
+    try:
+        return os.stat(MANIFEST_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _load_manifest():
+    if not os.path.exists(MANIFEST_FILE):
+        return None
+    try:
+        with open(MANIFEST_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[VectorStore] Ignoring unreadable manifest: {e}")
+        return None
+
+
+def _save_manifest(manifest):
+    os.makedirs(PERSIST_DIR, exist_ok=True)
+    tmp_file = f"{MANIFEST_FILE}.{os.getpid()}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, MANIFEST_FILE)
+
+
+def _open_vectorstore():
+    from langchain.vectorstores import Chroma
+
+    os.makedirs(PERSIST_DIR, exist_ok=True)
+    return Chroma(
+        collection_name=COLLECTION_NAME,
+        embedding_function=get_embeddings(),
+        persist_directory=PERSIST_DIR,
+    )
+
+
+def _forget_chroma_client(vectorstore):
+    """Make the next _open_vectorstore() read the index from disk again.
+
+    chromadb shares one client per persist directory within a process and keeps its
+    vector index in memory, so a new Chroma wrapper alone would not see chunks written
+    by another process (`python ingest.py`). Existing handles keep the old client.
+    """
+    from chromadb.api.shared_system_client import SharedSystemClient
+
+    SharedSystemClient._identifier_to_system.pop(vectorstore._client._identifier, None)
+
+
+def _load_chunks(vectorstore):
+    stored = vectorstore.get(include=["documents", "metadatas"])
+    return [
+        Document(id=chunk_id, page_content=text, metadata=meta or {})
+        for chunk_id, text, meta in zip(stored.get("ids", []), stored.get("documents", []), stored.get("metadatas", []))
+    ]
+
+
+def _load_lexical_index():
+    if not os.path.exists(LEXICAL_INDEX_FILE):
+        return None
+    try:
+        return BM25Index.load(LEXICAL_INDEX_FILE)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[VectorStore] Ignoring unreadable lexical index: {e}")
+        return None
+
+
+def _open_lexical_index(chunks):
+    """Load the persisted BM25 index, rebuilding it from the chunks if it is missing or stale."""
+    version = get_index_version()
+    index = _load_lexical_index()
+    if index is not None and index.version == version and len(index) == len(chunks):
+        return index
+    print(f"[VectorStore] Building lexical index over {len(chunks)} chunks")
+    index = BM25Index()
+    for chunk in chunks:
+        index.add(chunk.id, chunk.page_content)
+    index.version = version
+    index.save(LEXICAL_INDEX_FILE)
+    return index
+
+
+class HybridRetriever(BaseRetriever):
+    """Dense (Chroma) plus lexical (BM25) retrieval, fused with reciprocal rank fusion.
+
+    Exact terms such as "LTA" or "Form 16" are found by BM25 even when the embedding
+    model misses them, and chunks both retrievers agree on rise to the top. Without a
+    lexical index it is plain dense search. Either way every returned chunk carries
+    its cosine similarity to the query in `metadata["score"]`, and chunks BM25 found
+    their rank there in `metadata["lexical_rank"]`. With a reranker, a wider candidate
+    set is retrieved and the reranker picks the final k.
+    """
+
+    vectorstore: Any
+    lexical_index: Any = None
+    chunks_by_id: Dict[str, Any]
+    k: int = RETRIEVER_K
+    candidates: int = HYBRID_CANDIDATES
+    rrf_k: int = RRF_K
+    reranker: Any = None
+
+    def _similarity(self, distance: float) -> float:
+        # Chroma's default "l2" space reports squared distance; on unit vectors that is 2 - 2*cos.
+        space = (self.vectorstore._collection.metadata or {}).get("hnsw:space", "l2")
+        return 1.0 - distance / 2 if space == "l2" else 1.0 - distance
+
+    def _dense_distances(self, query_embedding, n_results, ids=None) -> Dict[str, float]:
+        if not n_results:
+            return {}
+        result = self.vectorstore._collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results,
+            ids=ids,
+            include=["distances"],
+        )
+        return dict(zip(result["ids"][0], result["distances"][0]))
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        limit = max(self.k, self.reranker.candidates) if self.reranker is not None else self.k
+        with tracing.span("retrieval.dense"):
+            query_embedding = self.vectorstore.embeddings.embed_query(query)
+            n_candidates = min(max(self.candidates, limit) if self.lexical_index is not None else limit, len(self.chunks_by_id))
+            distances = self._dense_distances(query_embedding, n_candidates)
+        best = list(distances)[:limit]
+        lexical_ranks = {}
+        if self.lexical_index is not None:
+            with tracing.span("retrieval.bm25"):
+                lexical = [chunk_id for chunk_id, _ in self.lexical_index.search(query, self.candidates)]
+            lexical_ranks = {chunk_id: rank for rank, chunk_id in enumerate(lexical)}
+            fused = {}
+            for ranking in (list(distances), lexical):
+                for rank, chunk_id in enumerate(ranking):
+                    fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+            best = [chunk_id for chunk_id in sorted(fused, key=fused.get, reverse=True) if chunk_id in self.chunks_by_id][:limit]
+            lexical_only = [chunk_id for chunk_id in best if chunk_id not in distances]
+            distances.update(self._dense_distances(query_embedding, len(lexical_only), ids=lexical_only))
+        docs = []
+        for chunk_id in best:
+            chunk = self.chunks_by_id.get(chunk_id)
+            if chunk is None:
+                continue
+            score = round(self._similarity(distances[chunk_id]), 4) if chunk_id in distances else None
+            metadata = {**chunk.metadata, "score": score}
+            if chunk_id in lexical_ranks:
+                metadata["lexical_rank"] = lexical_ranks[chunk_id]
+            docs.append(Document(id=chunk_id, page_content=chunk.page_content, metadata=metadata))
+        if self.reranker is not None and len(docs) > self.k:
+            with tracing.span("retrieval.rerank", candidates=len(docs)):
+                docs = self.reranker.rerank(query, docs, self.k)
+        return docs
+
+
+def _plan_sync(manifest, full):
+    """Work out which files a sync has to (re)index or remove, without touching the store."""
+    rebuild = full or manifest is None or manifest.get("splitter") != _splitter_config()
+    indexed = {} if rebuild else manifest["files"]
+    current = _list_source_files()
+    plan = {"rebuild": rebuild, "to_index": {}, "added": [], "updated": [], "removed": sorted(set(indexed) - set(current)), "unchanged": []}
+    for fname, path in current.items():
+        file_hash = _file_hash(path)
+        entry = indexed.get(fname)
+        if entry and entry["hash"] == file_hash:
+            plan["unchanged"].append(fname)
+            continue
+        plan["to_index"][fname] = (path, file_hash)
+        plan["updated" if entry else "added"].append(fname)
+    return plan
+
+
+def _open_index():
+    global VECTORSTORE, RETRIEVER, CHUNKS, LEXICAL_INDEX
+    _OPENED_MANIFEST.update(mtime=_manifest_mtime(), version=get_index_version())
+    VECTORSTORE = _open_vectorstore()
+    CHUNKS = _load_chunks(VECTORSTORE)
+    LEXICAL_INDEX = None if RETRIEVER_MODE == "dense" else _open_lexical_index(CHUNKS)
+    RETRIEVER = HybridRetriever(
+        vectorstore=VECTORSTORE,
+        lexical_index=LEXICAL_INDEX,
+        chunks_by_id={chunk.id: chunk for chunk in CHUNKS},
+        reranker=get_reranker(),
+    )
+
+
+def sync_vector_db(full=False, dry_run=False, workers=None, batch_size=None):
+    """Bring the persisted index in line with DATA_DIR.
+
+    Only files whose content hash changed since the last sync are re-chunked and
+    re-embedded; files that disappeared are removed from the collection. A full
+    sync (or a change in splitter settings) drops the collection and rebuilds it.
+    The BM25 index is kept in step chunk by chunk. A dry run only reports what would change, with chunk counts from parsing.
+    """
+    with _lock:
+        manifest = _load_manifest()
+        plan = _plan_sync(manifest, full)
+        stats = {key: plan[key] for key in ("rebuild", "added", "updated", "removed", "unchanged")}
+
+        if dry_run:
+            stats["chunks_to_index"] = count_chunks(plan["to_index"], workers=workers)
+            return stats
+
+        vectorstore = _open_vectorstore()
+        lexical_index = None if plan["rebuild"] else _load_lexical_index()
+        if plan["rebuild"]:
+            vectorstore.delete_collection()
+            vectorstore = _open_vectorstore()
+            manifest = {"splitter": _splitter_config(), "files": {}}
+        if lexical_index is None or lexical_index.version != get_index_version():
+            # Missing or out of step with the manifest: start over from what Chroma holds.
+            lexical_index = BM25Index()
+            for chunk in _load_chunks(vectorstore):
+                lexical_index.add(chunk.id, chunk.page_content)
+        indexed = manifest["files"]
+
+        for fname in plan["removed"] + plan["updated"]:
+            ids = indexed.pop(fname)["ids"]
+            if not ids:
+                # Empty or image-only files are tracked by hash but own no chunks; Chroma rejects empty deletes.
+                continue
+            vectorstore.delete(ids=ids)
+            for chunk_id in ids:
+                lexical_index.remove(chunk_id)
+
+        def index_lexically(ids, texts):
+            for chunk_id, text in zip(ids, texts):
+                lexical_index.add(chunk_id, text)
+
+        if plan["to_index"]:
+            ids_by_file, report = ingest_files(
+                vectorstore, vectorstore.embeddings, plan["to_index"],
+                batch_size=batch_size, workers=workers, on_batch=index_lexically,
+            )
+            for fname, ids in ids_by_file.items():
+                indexed[fname] = {"hash": plan["to_index"][fname][1], "ids": ids}
+            stats["ingestion"] = report.summary()
+
+        _save_manifest(manifest)
+        lexical_index.version = get_index_version()
+        lexical_index.save(LEXICAL_INDEX_FILE)
+        _open_index()
+        stats["chunks"] = len(CHUNKS)
+        print(
+            f"[VectorStore] Sync complete: {len(stats['added'])} added, {len(stats['updated'])} updated, "
+            f"{len(stats['removed'])} removed, {len(stats['unchanged'])} unchanged ({stats['chunks']} chunks)"
+        )
+        return stats
+
+
+def get_index_version():
+    """Fingerprint of the indexed corpus; changes whenever a sync adds, updates or removes a file."""
+    manifest = _load_manifest()
+    if manifest is None:
+        return None
+    digest = hashlib.sha256(json.dumps(manifest.get("splitter"), sort_keys=True).encode())
+    for fname, entry in sorted(manifest["files"].items()):
+        digest.update(f"{fname}:{entry['hash']}".encode())
+    return digest.hexdigest()
+
+
 def get_retriever():
-    global VECTORSTORE, RETRIEVER, CHUNKS
-    if RETRIEVER is not None:
+    """Open the index built by `python ingest.py`; only build it here if it has never been built.
+
+    Set VECTORSTORE_AUTO_SYNC=true to also pick up changed policy files at app startup.
+    If `python ingest.py` updates the index while the app is running, the index is
+    reopened from disk on the next call, so changed, added and deleted files are picked up.
+    """
+    if RETRIEVER is not None and _manifest_mtime() == _OPENED_MANIFEST["mtime"]:
+        return RETRIEVER
+    with _lock:
+        if RETRIEVER is not None and _manifest_mtime() != _OPENED_MANIFEST["mtime"]:
+            if get_index_version() != _OPENED_MANIFEST["version"]:
+                print("[VectorStore] Index was updated by another process; reopening it")
+                _forget_chroma_client(VECTORSTORE)
+                _open_index()
+            else:
+                _OPENED_MANIFEST["mtime"] = _manifest_mtime()
+        if RETRIEVER is None:
+            manifest = _load_manifest()
+            if manifest is None:
+                print("[VectorStore] No index found; building it now (run `python ingest.py` ahead of time to skip this)")
+                sync_vector_db()
+            elif AUTO_SYNC:
+                sync_vector_db()
+            else:
+                if manifest.get("splitter") != _splitter_config():
+                    print("[VectorStore] Index was built with different splitter settings; run `python ingest.py` to rebuild it")
+                _open_index()
         return RETRIEVER
-    docs = load_documents()
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    CHUNKS = splitter.split_documents(docs)
-    embeddings = get_embeddings()
-    VECTORSTORE = Chroma.from_documents(CHUNKS, embeddings)
-    RETRIEVER = VECTORSTORE.as_retriever()
-    return RETRIEVER
+
 
 def reset_vector_db():
-    global VECTORSTORE, RETRIEVER, CHUNKS
-    docs = load_documents()
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    CHUNKS = splitter.split_documents(docs)
-    embeddings = get_embeddings()
-    VECTORSTORE = Chroma.from_documents(CHUNKS, embeddings)
-    RETRIEVER = VECTORSTORE.as_retriever()
\ No newline at end of file
+    sync_vector_db(full=True)
@@ -1,38 +1,61 @@
 import requests
-import time
 import json
 import os
 from typing import Dict, Any, List
 from urllib.parse import quote_plus, urlparse
 import random
 import re
-
-# Simple in-memory cache for rate limiting
-_search_cache = {}
-_last_search_time = 0
-_rate_limit_delay = 1  # seconds between searches
+from providers.search_cache import SearchCache, normalize_query
+from providers.rate_limit import MonthlyQuota, RequestCoalescer, TokenBucket
+from providers.http_client import CircuitBreaker, CircuitOpenError, PooledHttpClient
+from utils import tracing
+
+_search_cache = SearchCache(
+    max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "256")),
+    ttl=float(os.getenv("SEARCH_CACHE_TTL", "86400")),
+    fresh_ttl=float(os.getenv("SEARCH_CACHE_FRESH_TTL", "900")),
+    db_path=os.getenv("SEARCH_CACHE_DB") or None,
+)
+_rate_limiter = TokenBucket(
+    rate=float(os.getenv("SERPAPI_RATE_PER_SEC", "1")),
+    burst=int(os.getenv("SERPAPI_BURST", "3")),
+)
+_quota = MonthlyQuota(
+    limit=int(os.getenv("SERPAPI_MONTHLY_QUOTA", "100")),
+    state_file=os.getenv("SERPAPI_QUOTA_FILE", os.path.join(os.path.dirname(__file__), "..", "data", "serpapi_usage.json")),
+)
+_coalescer = RequestCoalescer()
+SERPAPI_URL = os.getenv("SERPAPI_URL", "https://serpapi.com/search")
+_http = PooledHttpClient(
+    connect_timeout=float(os.getenv("SERPAPI_CONNECT_TIMEOUT", "3.05")),
+    read_timeout=float(os.getenv("SERPAPI_READ_TIMEOUT", "10")),
+    retries=int(os.getenv("SERPAPI_RETRIES", "2")),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv("SERPAPI_BREAKER_THRESHOLD", "5")),
+        reset_timeout=float(os.getenv("SERPAPI_BREAKER_RESET", "60")),
+    ),
+)
 
 def web_search(query: str) -> Dict[str, Any]:
     """
     Real web search using SerpAPI for comprehensive results.
     """
-    global _last_search_time
-
-    # Check cache first
-    if query in _search_cache:
-        return _search_cache[query]
+    with tracing.span("websearch") as span:
+        # Check cache first
+        cached = _search_cache.get(query)
+        span.set(cache_hit=cached is not None)
+        if cached is not None:
+            return cached
 
-    # Rate limiting
-    current_time = time.time()
-    if current_time - _last_search_time < _rate_limit_delay:
-        time.sleep(_rate_limit_delay - (current_time - _last_search_time))
-    _last_search_time = time.time()
+        # Concurrent identical queries share one SerpAPI call
+        return _coalescer.run(normalize_query(query), lambda: _search_uncached(query))
 
+def _search_uncached(query: str) -> Dict[str, Any]:
     try:
         # Use SerpAPI exclusively
         result = _serpapi_search(query)
         if result and result.get("answer"):
-            _search_cache[query] = result
+            _search_cache.put(query, result)
             return result
 
         # If SerpAPI fails, provide helpful guidance
@@ -51,7 +74,18 @@ def _serpapi_search(query: str) -> Dict[str, Any] | None:
             print("SERPAPI_KEY not found in environment variables")
             return None
 
-        url = "https://serpapi.com/search"
+        if _http.breaker.state == "open":
+            print("SerpAPI circuit open, skipping search")
+            return None
+
+        if not _rate_limiter.try_acquire():
+            print("SerpAPI rate limit reached, skipping search")
+            return None
+        if _quota.exhausted():
+            print("SerpAPI monthly quota exhausted, skipping search")
+            return None
+
+        url = SERPAPI_URL
         params = {
             "q": query,
             "api_key": api_key,
@@ -61,8 +95,11 @@ def _serpapi_search(query: str) -> Dict[str, Any] | None:
             "hl": "en"   # Language
         }
 
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
+        with tracing.span("serpapi.search") as span:
+            response = _http.get(url, params=params)
+            span.set(status_code=response.status_code)
+            response.raise_for_status()
+        _quota.consume()
 
         data = response.json()
 
@@ -95,6 +132,9 @@ def _serpapi_search(query: str) -> Dict[str, Any] | None:
 
         return None
 
+    except CircuitOpenError as e:
+        print(f"SerpAPI request skipped: {e}")
+        return None
     except requests.exceptions.RequestException as e:
         print(f"SerpAPI request failed: {e}")
         return None
@@ -127,8 +167,7 @@ def _get_helpful_fallback(query: str) -> Dict[str, Any]:
 
 def clear_search_cache():
     """Clear the search cache"""
-    global _search_cache
-    _search_cache = {}
+    _search_cache.clear()
     print("Web search cache cleared!")
 
 def get_search_status():
@@ -139,6 +178,11 @@ def get_search_status():
     return {
         "search_engine": "SerpAPI (Google Search)",
         "api_key_status": status,
+        "cache": _search_cache.stats(),
+        "rate_limit": _rate_limiter.stats(),
+        "quota": _quota.stats(),
+        "coalesced_requests": _coalescer.coalesced,
+        "http": _http.stats(),
         "setup_instructions": [
             "Add SERPAPI_KEY to your .env file",
             "Get your API key from https://serpapi.com/",
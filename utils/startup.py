@@ -0,0 +1,35 @@
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+# Streamlit re-runs main.py on every interaction; phases are recorded once per process.
+_PROCESS_STARTED = time.perf_counter()
+_PHASES = {}
+
+
+@contextmanager
+def timed(phase):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if phase not in _PHASES:
+            _PHASES[phase] = time.perf_counter() - started
+            print(f"[Startup] {phase}: {_PHASES[phase]:.2f}s")
+
+
+def rss_mb():
+    """Current resident set size of this process in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def startup_report():
+    """Seconds spent in each recorded startup phase, in the order they first ran."""
+    return dict(_PHASES)
@@ -0,0 +1,242 @@
+"""Lightweight request tracing: nested timed spans exported as JSON lines.
+
+    with span("serpapi.search", query=query) as s:
+        ...
+        s.set(status_code=200)
+
+Spans opened while another span is active (in the same thread, asyncio task, or a
+copied context) become its children, so one chat request yields one trace. Every
+finished span is appended to TRACE_FILE (if set) and, when TRACE_OTLP_ENDPOINT is
+set and the OpenTelemetry SDK is installed, also sent to that collector. Nothing is
+ever written to stdout, which the MCP server uses for its protocol.
+
+    python -m utils.tracing data/traces.jsonl    # p50/p95 latency per span name
+"""
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+ENABLED = os.getenv("TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "")
+
+_service = os.getenv("TRACE_SERVICE", "annet")
+_current = ContextVar("trace_span", default=None)
+_durations = defaultdict(lambda: deque(maxlen=500))
+_errors = defaultdict(int)
+_lock = threading.Lock()
+_file = None
+_otel_tracer = None
+_otel_checked = False
+
+
+def set_service_name(name):
+    """Name recorded on every span from this process (e.g. the MCP server subprocess)."""
+    global _service
+    _service = name
+
+
+def _get_otel_tracer():
+    global _otel_tracer, _otel_checked
+    if _otel_checked:
+        return _otel_tracer
+    with _lock:
+        if not _otel_checked:
+            _otel_checked = True
+            try:
+                from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+                from opentelemetry.sdk.resources import Resource
+                from opentelemetry.sdk.trace import TracerProvider
+                from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+                provider = TracerProvider(resource=Resource.create({"service.name": _service}))
+                provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=OTLP_ENDPOINT)))
+                _otel_tracer = provider.get_tracer("annet")
+            except ImportError:
+                print("[Tracing] TRACE_OTLP_ENDPOINT is set but opentelemetry-sdk/exporter is not installed", file=sys.stderr)
+    return _otel_tracer
+
+
+class Span:
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+        self.error = None
+        self._otel = None
+        tracer = _get_otel_tracer() if OTLP_ENDPOINT else None
+        if tracer is not None:
+            from opentelemetry import trace
+
+            context = trace.set_span_in_context(parent._otel) if parent is not None and parent._otel is not None else None
+            self._otel = tracer.start_span(name, context=context, start_time=time.time_ns())
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self, error=None):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._started
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+        _export(self)
+
+    def to_dict(self):
+        return {
+            "ts": self.start_time,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": _service,
+            "duration_ms": round(self.duration * 1000, 2),
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+def _export(span):
+    with _lock:
+        _durations[span.name].append(span.duration)
+        if span.error:
+            _errors[span.name] += 1
+    if TRACE_FILE:
+        _write(span.to_dict())
+    if span._otel is not None:
+        from opentelemetry.trace import Status, StatusCode
+
+        span._otel.set_attributes({k: v if isinstance(v, (str, int, float, bool)) else str(v) for k, v in span.attributes.items()})
+        if span.error:
+            span._otel.set_status(Status(StatusCode.ERROR, span.error))
+        span._otel.end()
+
+
+def _write(record):
+    global _file
+    line = json.dumps(record, default=str) + "\n"
+    try:
+        with _lock:
+            if _file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(TRACE_FILE)), exist_ok=True)
+                _file = open(TRACE_FILE, "a", buffering=1)
+            _file.write(line)
+    except OSError as e:
+        print(f"[Tracing] Could not write trace: {e}", file=sys.stderr)
+
+
+class _NoopSpan:
+    def set(self, **attributes):
+        pass
+
+    def end(self, error=None):
+        pass
+
+
+def current_span():
+    return _current.get()
+
+
+def start_span(name, parent=None, **attributes):
+    """Start a span without making it current; the caller must call `end()`. For callback-style hooks."""
+    if not ENABLED:
+        return _NoopSpan()
+    return Span(name, parent if parent is not None else _current.get(), attributes)
+
+
+@contextmanager
+def use_span(span):
+    """Make `span` the parent of spans opened inside the block (e.g. on another thread or event loop)."""
+    token = _current.set(span)
+    try:
+        yield span
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            pass
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time the block as a child of the current span; exceptions mark it as failed and propagate."""
+    if not ENABLED:
+        yield _NoopSpan()
+        return
+    current = Span(name, _current.get(), attributes)
+    token = _current.set(current)
+    error = None
+    try:
+        yield current
+    except GeneratorExit:
+        raise
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # A generator holding the span was closed from another context.
+            pass
+        current.end(error)
+
+
+def _percentile(samples, p):
+    return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+
+def span_stats():
+    """Recent latency per span name in this process: count, errors, p50/p95/max in ms."""
+    with _lock:
+        snapshot = {name: sorted(samples) for name, samples in _durations.items()}
+        errors = dict(_errors)
+    return {
+        name: {
+            "count": len(samples),
+            "errors": errors.get(name, 0),
+            "p50_ms": round(_percentile(samples, 0.5) * 1000, 1),
+            "p95_ms": round(_percentile(samples, 0.95) * 1000, 1),
+            "max_ms": round(samples[-1] * 1000, 1),
+        }
+        for name, samples in sorted(snapshot.items())
+        if samples
+    }
+
+
+def summarize_file(path):
+    """p50/p95 latency per (service, span name) from an exported JSON lines trace file."""
+    durations = defaultdict(list)
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            durations[(record.get("service"), record["name"])].append(record["duration_ms"])
+    rows = []
+    for (service, name), samples in sorted(durations.items()):
+        samples.sort()
+        rows.append((service, name, len(samples), _percentile(samples, 0.5), _percentile(samples, 0.95), samples[-1]))
+    return rows
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else TRACE_FILE
+    if not path:
+        sys.exit("usage: python -m utils.tracing TRACE_FILE")
+    print(f"{'service':<12} {'span':<32} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for service, name, count, p50, p95, worst in summarize_file(path):
+        print(f"{service or '-':<12} {name:<32} {count:>6} {p50:>9.1f} {p95:>9.1f} {worst:>9.1f}")